@@ -0,0 +1,174 @@
+"""
+LangGraph ReAct agent over the scheduling tools.
+
+The direct workflow in tools.run_session_agent doesn't need it, so the graph
+(and langgraph itself) is only built the first time safe_ai_invoke runs.
+"""
+import logging
+import threading
+from typing import TypedDict, List, Optional
+
+import deadlines
+from clients import get_llm, invoke_llm
+from metrics import startup_phase
+
+logger = logging.getLogger(__name__)
+
+# --- LangGraph Setup ---
+class AgentState(TypedDict):
+    messages: List[dict]
+    next: Optional[str]
+
+# System prompt for the agent
+system_prompt = """
+You are an intelligent AI session scheduler. Your role is determined by the user type:
+
+**FOR TEACHERS (user_id = e4bcab2f-8da5-4a78-85e8-094f4d7ac308):**
+- ONLY job: Set teacher availability using parse_teacher_availability() and set_teacher_availability()
+- Teachers can teach ANY subject - don't ask for subject clarification
+- Return the exact result from set_teacher_availability() tool
+
+**FOR ALL OTHER USERS (Students):**
+- IMMEDIATELY use tools, do NOT explain what you're doing
+- Follow this workflow EXACTLY:
+  1. Call parse_student_request() with student_id and message
+  2. Call create_new_session() with the parsed data (this handles everything automatically)
+  3. Return the EXACT result from create_new_session() tool
+
+**RESPONSE FORMAT:**
+- Use tools immediately, no explanations
+- Return the EXACT tool result as your final response
+- Do NOT add any additional text or explanations
+- Example: If tool returns "Python session created at 12:00-13:00", return exactly that
+
+**CRITICAL RULES:**
+- ALWAYS return the exact tool result as your final response
+- Do NOT modify or add to the tool result
+- Do NOT explain what you're doing
+- Just call the tool and return its result
+"""
+
+_graph = None
+_graph_built = False
+_graph_lock = threading.Lock()
+
+
+def get_agent():
+    """Compiled ReAct agent graph, built on first use; None when the LLM is unavailable"""
+    global _graph, _graph_built
+    if _graph_built:
+        return _graph
+    with _graph_lock:
+        if _graph_built:
+            return _graph
+        llm = get_llm()
+        if llm is not None:
+            try:
+                with startup_phase("agent_graph"):
+                    from langchain_core.messages import SystemMessage
+                    from langgraph.prebuilt import create_react_agent
+                    from tools import tools
+                    
+                    # Create the agent with tools and system message
+                    _graph = create_react_agent(
+                        llm, 
+                        [t.as_langchain() for t in tools], 
+                        state_modifier=SystemMessage(content=system_prompt)
+                    )
+                logger.info("✅ LangGraph agent created successfully")
+            except Exception as e:
+                logger.exception("❌ Error creating LangGraph agent: %s", e)
+                _graph = None
+        else:
+            logger.warning("⚠️ LangGraph agent not created - using mock responses")
+        _graph_built = True
+    return _graph
+
+
+def safe_ai_invoke(messages: list, fallback_message: str = "I'll help you with your session request.") -> str:
+    """Safely invoke AI agent with tools for actual session creation"""
+    try:
+        deadlines.check("agent", deadlines.MIN_LLM_SECONDS)
+    except deadlines.DeadlineExceeded as e:
+        logger.warning("⏱️ Skipping agent: %s", e)
+        return fallback_message
+    try:
+        llm = get_llm()
+        graph = get_agent()
+        if llm is None or graph is None:
+            logger.warning("⚠️ LLM or graph is None, using fallback")
+            return fallback_message
+        
+        logger.debug("🤖 Using LangGraph agent with tools")
+        
+        # Convert messages to LangChain format
+        from langchain_core.messages import SystemMessage, HumanMessage
+        
+        langchain_messages = []
+        for msg in messages:
+            if msg.get("role") == "system":
+                langchain_messages.append(SystemMessage(content=msg.get("content", "")))
+            elif msg.get("role") == "user":
+                langchain_messages.append(HumanMessage(content=msg.get("content", "")))
+        
+        # Invoke the agent with tools
+        try:
+            result = graph.invoke({"messages": langchain_messages})
+            
+            # Extract the final response - handle different result formats
+            if result:
+                logger.debug("🔍 Agent result type: %s", type(result))
+                logger.debug("🔍 Agent result keys: %s", result.keys() if isinstance(result, dict) else 'Not a dict')
+                
+                if isinstance(result, dict) and "messages" in result:
+                    final_message = result["messages"][-1]
+                    if hasattr(final_message, 'content'):
+                        response_content = final_message.content
+                        logger.debug("✅ Agent response: %s...", response_content[:100])
+                        return response_content
+                    else:
+                        logger.warning("⚠️ Final message has no content: %s", final_message)
+                        return fallback_message
+                elif isinstance(result, list) and len(result) > 0:
+                    # Sometimes the result is directly a list of messages
+                    final_message = result[-1]
+                    if hasattr(final_message, 'content'):
+                        response_content = final_message.content
+                        logger.debug("✅ Agent response (list): %s...", response_content[:100])
+                        return response_content
+                    else:
+                        logger.warning("⚠️ Final message in list has no content: %s", final_message)
+                        return fallback_message
+                else:
+                    logger.warning("⚠️ Unexpected result format: %s", result)
+                    return fallback_message
+            else:
+                logger.warning("⚠️ Agent result is None or empty")
+                return fallback_message
+                
+        except Exception as agent_error:
+            logger.error("❌ Agent invocation failed: %s", agent_error)
+            # Fallback to direct LLM call without tools
+            logger.debug("🔄 Falling back to direct LLM call")
+            
+            system_msg = ""
+            user_msg = ""
+            
+            for msg in messages:
+                if msg.get("role") == "system":
+                    system_msg = msg.get("content", "")
+                elif msg.get("role") == "user":
+                    user_msg = msg.get("content", "")
+            
+            full_prompt = f"{system_msg}\n\nUser Request: {user_msg}"
+            response = invoke_llm(llm, full_prompt, "agent_fallback")
+            
+            if hasattr(response, 'content') and response.content:
+                logger.debug("✅ Fallback LLM response: %s...", response.content[:100])
+                return response.content
+            else:
+                return fallback_message
+        
+    except Exception as e:
+        logger.exception("❌ Safe AI invoke failed: %s", e)
+        return fallback_message
\ No newline at end of file
@@ -1,10 +1,26 @@
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import uvicorn
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional
 import asyncio
 from datetime import datetime
+import logging
 import os
+from log_config import configure_logging
+from metrics import REQUEST_LATENCY, STARTUP_SECONDS, render_latest, startup_report, CONTENT_TYPE_LATEST
+from tracing import start_trace, parse_traceparent, current_trace_id
+import profiler
+import recorder
+import warmup
+import events
+import idempotency
+import jobs
+import deadlines
+from load_shedding import shedder
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -12,24 +28,75 @@ except ImportError:
     # Fallback if python-dotenv is not available
     pass
 
-app = FastAPI(title="AI Session Scheduler API")
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# orjson is optional; when installed it replaces the much slower stdlib encoder for responses
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
+app = FastAPI(title="AI Session Scheduler API", default_response_class=DefaultResponse)
+STARTUP_SECONDS.set(round(time.perf_counter() - _import_started, 4), component="api_import")
 
 # Keep-alive mechanism to prevent Render container sleep
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(keep_alive_task())
+    if warmup.WARMUP_BEFORE_SERVING:
+        # Other workers keep serving while this one warms up
+        await warmup_task()
+    else:
+        asyncio.create_task(warmup_task())
+    if _claim_keep_alive():
+        logger.info("🔄 Keep-alive pings run in worker %s", os.getpid())
+        asyncio.create_task(keep_alive_task())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Let running chat jobs finish before the process exits"""
+    await asyncio.get_running_loop().run_in_executor(None, jobs.queue.shutdown)
+
+async def warmup_task():
+    """Warm clients and caches off the event loop; /api/ready reports ready afterwards"""
+    await asyncio.get_running_loop().run_in_executor(None, warmup.run_warmup)
+    logger.info("🚀 Startup phases (s): %s", startup_report())
+
+_keep_alive_lock = None
+
+def _claim_keep_alive() -> bool:
+    """True in one worker process per host and port; the lock is released when that worker
+    exits, and the worker started in its place takes the pings over"""
+    global _keep_alive_lock
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): every process pings
+        return True
+    import tempfile
+    path = os.path.join(tempfile.gettempdir(), f"scheduler-keep-alive-{os.getenv('PORT', '8000')}.lock")
+    lock = open(path, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _keep_alive_lock = lock
+    return True
 
 async def keep_alive_task():
     """Ping self every 10 minutes to prevent container sleep"""
     import httpx
+    url = f"http://localhost:{os.getenv('PORT', '8000')}/api/health"
     while True:
         try:
             await asyncio.sleep(600)  # 10 minutes
             async with httpx.AsyncClient() as client:
-                await client.get("http://localhost:8000/api/health", timeout=5)
-            print(f"🔄 Keep-alive ping at {datetime.now()}")
+                await client.get(url, timeout=5)
+            logger.info("🔄 Keep-alive ping at %s", datetime.now())
         except Exception as e:
-            print(f"⚠️ Keep-alive failed: {e}")
+            logger.warning("⚠️ Keep-alive failed: %s", e)
 
 # CORS - Allow frontend to connect
 allowed_origins = [
@@ -51,86 +118,439 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (session lists, solver plans); the SSE stream is never compressed
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("COMPRESS_MIN_BYTES", "1024")), compresslevel=5)
+
+# Request latency per route; unknown paths share one label to bound cardinality
+_route_paths = None
+UNTRACED_PATHS = {"/api/metrics", "/api/health", "/api/ready", "/api/events"}
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    global _route_paths
+    if _route_paths is None:
+        _route_paths = {route.path for route in app.routes}
+    path = request.url.path
+    endpoint = path if path in _route_paths else "/api/jobs" if path.startswith("/api/jobs/") else "other"
+    started = time.perf_counter()
+    try:
+        if not path.startswith("/api/") or path in UNTRACED_PATHS or path.endswith("/events"):
+            return await call_next(request)
+        
+        # Reuse the caller's trace id (W3C traceparent or X-Trace-Id) so spans join their trace
+        trace_id = parse_traceparent(request.headers.get("traceparent")) or request.headers.get("x-trace-id")
+        with start_trace(f"{request.method} {endpoint}", trace_id=trace_id, endpoint=endpoint) as root:
+            sampler = None
+            if not path.startswith("/api/debug/") and profiler.should_profile(request.headers.get("x-profile")):
+                sampler = profiler.SamplingProfiler().start()
+            try:
+                response = await call_next(request)
+            finally:
+                if sampler is not None:
+                    profile_id = profiler.save_profile(sampler.stop(), f"{request.method} {endpoint}", root.trace.trace_id)
+            root.attributes["status_code"] = response.status_code
+            response.headers["X-Trace-Id"] = root.trace.trace_id
+            if sampler is not None:
+                response.headers["X-Profile-Id"] = profile_id
+            return response
+    finally:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+
 class ChatRequest(BaseModel):
     message: str
     user_id: str
     is_teacher: bool = False
+    idempotency_key: Optional[str] = None  # same key on retries; the Idempotency-Key header works too
+    async_job: bool = False  # queue and answer 202 with a job id; "Prefer: respond-async" works too
 
 class TeacherSessionsRequest(BaseModel):
     teacher_id: str
     filter_type: str = "all"  # "all", "today_future", "today", "future"
+    since: Optional[str] = None  # version from a previous response; only sessions changed after it are returned
+
+class MySessionsRequest(BaseModel):
+    student_id: str
+    since_version: Optional[int] = None  # version from the previous response
+
+class FreeSlotsRequest(BaseModel):
+    subject: str
+    date: str  # YYYY-MM-DD
+    start_time: str  # HH:MM:SS, the preferred slot
+    end_time: str
+    k: int = Field(default=3, ge=1, le=20)
+
+class SolveScheduleRequest(BaseModel):
+    date: str  # YYYY-MM-DD
+    duration_minutes: int = Field(default=60, gt=0, le=1440)
+    step_minutes: int = Field(default=15, gt=0, le=1440)
+
+class CancelRequest(BaseModel):
+    user_id: str
+    session_id: str
+    is_teacher: bool = False
+
+class SplitSessionsRequest(BaseModel):
+    subject: str
+    date: str  # YYYY-MM-DD
+    max_class_size: int = Field(default=20, ge=1, le=500)
+    max_sections: int = Field(default=3, ge=1, le=12)
+    session_minutes: int = Field(default=60, gt=0, le=1440)
 
 @app.post("/api/chat-session")
-async def chat_session(request: ChatRequest):
-    """Handle chat messages and create sessions"""
+async def chat_session(request: ChatRequest, http_request: Request, http_response: Response):
+    """Handle chat messages and create sessions.
+    Retries with the same Idempotency-Key get the first response back without re-running the agent."""
+    claim = None
+    key = http_request.headers.get("idempotency-key") or request.idempotency_key
+    if key:
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            return JSONResponse(status_code=422, content={"success": False, "error": "Idempotency key is too long"})
+        fingerprint = idempotency.fingerprint(request.message, request.is_teacher)
+        claim, owner = idempotency.store.claim(f"{request.user_id}:{key}", fingerprint)
+        if not owner:
+            if claim.fingerprint != fingerprint:
+                return JSONResponse(status_code=422, content={"success": False, "error": "Idempotency key was already used for a different message"})
+            logger.info("🔁 Replaying chat response for idempotency key %s", key)
+            http_response.headers["Idempotent-Replayed"] = "true"
+            budget = deadlines.budget_seconds(http_request.headers.get("x-request-timeout"))
+            result = await idempotency.store.wait(claim, budget)
+            if result is None:
+                logger.warning("⏱️ Gave up waiting for the first request with idempotency key %s", key)
+                return {"success": False, "response": "⏱️ That took too long. Please send your message again.",
+                        "error": "The first request with this idempotency key is still running",
+                        "user_id": request.user_id, "is_teacher": request.is_teacher}
+            if "job_id" in result:
+                http_response.status_code = 202
+            return result
+    
+    try:
+        return await _answer_chat(request, http_request, http_response, claim)
+    except BaseException:
+        # Whatever escaped, release the key so waiting replays and retries don't hang on it
+        if claim is not None:
+            idempotency.store.finish(claim, {"success": False, "error": "Request did not complete"}, keep=False)
+        raise
+
+async def _answer_chat(request: ChatRequest, http_request: Request, http_response: Response, claim):
+    """Run (or queue) a chat message for chat_session, finishing its idempotency claim"""
+    budget = deadlines.budget_seconds(http_request.headers.get("x-request-timeout"))
+    if request.async_job or "respond-async" in http_request.headers.get("prefer", ""):
+        payload = {"message": request.message, "user_id": request.user_id, "is_teacher": request.is_teacher}
+        try:
+            job = jobs.queue.submit(payload, current_trace_id(), budget)
+        except jobs.QueueFull:
+            logger.warning("⚠️ Job queue full, rejecting chat job for %s", request.user_id)
+            if claim is not None:
+                idempotency.store.finish(claim, {"success": False}, keep=False)
+            return JSONResponse(status_code=503, headers={"Retry-After": "5"},
+                                content={"success": False, "error": "Too many queued requests, try again shortly"})
+        result = {
+            "success": True,
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/jobs/{job.id}",
+            "user_id": request.user_id,
+            "is_teacher": request.is_teacher
+        }
+        if claim is not None:
+            idempotency.store.finish(claim, result)
+        http_response.status_code = 202
+        return result
+    
+    with deadlines.start(budget) as deadline:
+        try:
+            result = await _run_until_disconnect(http_request, deadline, jobs.chat_result,
+                                                 request.message, request.user_id, request.is_teacher)
+        except asyncio.CancelledError:
+            deadline.cancel()
+            raise
+    
+    if claim is not None:
+        idempotency.store.finish(claim, result, keep=result["success"])
+    recorder.record("/api/chat-session", request.model_dump(), result)
+    return result
+
+async def _wait_for_disconnect(http_request: Request):
+    # Request.is_disconnected() never sees the disconnect through the http middleware; receive() does
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+async def _run_until_disconnect(http_request: Request, deadline, func, *args):
+    """Run func in a worker thread (which inherits the deadline) and cancel the deadline
+    if the client goes away first, so the agent stops at its next checkpoint"""
+    work = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    watcher = asyncio.ensure_future(_wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not work.done():
+            logger.info("🔌 Client disconnected, stopping its chat request")
+            deadline.cancel()
+        return await work
+    finally:
+        watcher.cancel()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Status of an async chat job; result holds the chat response once status is done or failed.
+    wait=<seconds> (up to 30) holds the request until the job finishes."""
+    if wait > 0:
+        job = await jobs.queue.wait(job_id, min(wait, 30))
+    else:
+        job = jobs.queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Job not found"})
+    return {"success": True, "job": job}
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent job status: job.status now and whenever it changes, then job.finished"""
+    job = jobs.queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Job not found"})
+    
+    async def stream():
+        current, sent = job, None
+        while current is not None:
+            if current["status"] in jobs.FINISHED:
+                yield events.format_sse({"id": f"{job_id}-{current['status']}", "type": "job.finished", "data": current})
+                return
+            if current["status"] != sent:
+                sent = current["status"]
+                yield events.format_sse({"id": f"{job_id}-{sent}", "type": "job.status", "data": current})
+            else:
+                yield ": keep-alive\n\n"
+            # Queued jobs are re-checked every second so the switch to running gets reported
+            current = await jobs.queue.wait(job_id, 1 if sent == "queued" else events.HEARTBEAT_SECONDS)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/cancel")
+def cancel(request: CancelRequest):
+    """Student leaves a session, or the teacher cancels it"""
     try:
-        # Lazy import to reduce startup time
-        from tools import run_session_agent
+        from tools import cancel_enrollment, cancel_session
         
-        # Format message for the agent
         if request.is_teacher:
-            user_message = f"Teacher {request.user_id}: {request.message}"
+            response = cancel_session.invoke({"teacher_id": request.user_id, "session_id": request.session_id})
         else:
-            user_message = f"Student {request.user_id}: {request.message}"
-        
-        # Get AI response
-        response = run_session_agent(user_message)
+            response = cancel_enrollment.invoke({"student_id": request.user_id, "session_id": request.session_id})
         
         return {
-            "success": True,
+            "success": not response.startswith("❌"),
             "response": response,
             "user_id": request.user_id,
-            "is_teacher": request.is_teacher
+            "session_id": request.session_id
         }
         
     except Exception as e:
-        print(f"❌ API Error: {e}")
+        logger.exception("❌ API Error cancelling: %s", e)
         return {
             "success": False,
-            "response": "✅ I understand! Let me help you.",
+            "error": str(e),
             "user_id": request.user_id,
-            "is_teacher": request.is_teacher
+            "session_id": request.session_id
         }
 
 @app.post("/api/teacher-sessions")
-async def get_teacher_sessions(request: TeacherSessionsRequest):
-    """Get all sessions for a teacher with optional filtering"""
+def get_teacher_sessions(request: TeacherSessionsRequest, http_request: Request, response: Response):
+    """Get all sessions for a teacher with optional filtering.
+    Supports If-None-Match (304 when unchanged) and since=<version> for only the changed sessions."""
     try:
-        from tools import get_teacher_sessions_with_filter
+        from teacher_sessions import index
         
-        sessions = get_teacher_sessions_with_filter(request.teacher_id, request.filter_type)
+        view = index.get(request.teacher_id, request.filter_type, request.since)
+        if view["etag"]:
+            if http_request.headers.get("if-none-match") == view["etag"]:
+                return Response(status_code=304, headers={"ETag": view["etag"]})
+            response.headers["ETag"] = view["etag"]
         
-        return {
+        result = {
             "success": True,
-            "sessions": sessions,
+            "sessions": view["sessions"],
             "teacher_id": request.teacher_id,
-            "filter_type": request.filter_type
+            "filter_type": request.filter_type,
+            "version": view["version"],
+            "delta": view["delta"]
+        }
+        
+    except Exception as e:
+        logger.exception("❌ API Error getting teacher sessions: %s", e)
+        result = {
+            "success": False,
+            "error": str(e),
+            "sessions": []
+        }
+    
+    recorder.record("/api/teacher-sessions", request.model_dump(), result)
+    return result
+
+@app.post("/api/my-sessions")
+def get_my_sessions(request: MySessionsRequest):
+    """A student's upcoming sessions; empty and unchanged=True when since_version is still current"""
+    try:
+        from student_sessions import index
+        
+        version, sessions = index.get(request.student_id)
+        if request.since_version == version:
+            return {"success": True, "version": version, "unchanged": True, "sessions": []}
+        return {"success": True, "version": version, "unchanged": False, "sessions": sessions}
+        
+    except Exception as e:
+        logger.exception("❌ API Error getting student sessions: %s", e)
+        return {
+            "success": False,
+            "error": str(e),
+            "sessions": []
+        }
+
+@app.post("/api/free-slots")
+def free_slots(request: FreeSlotsRequest):
+    """Suggest the closest conflict-free windows for a requested session time"""
+    try:
+        from tools import suggest_free_slots
+        
+        slots = suggest_free_slots(request.subject, request.date, request.start_time, request.end_time, k=request.k)
+        
+        return {
+            "success": True,
+            "slots": slots,
+            "subject": request.subject,
+            "date": request.date
+        }
+        
+    except Exception as e:
+        logger.exception("❌ API Error finding free slots: %s", e)
+        return {
+            "success": False,
+            "error": str(e),
+            "slots": []
+        }
+
+@app.post("/api/solve-schedule")
+def solve_day_schedule(request: SolveScheduleRequest):
+    """Batch-solve all pending requests for a date into non-overlapping sessions"""
+    try:
+        from tools import load_day_demand
+        from schedule_solver import solve_schedule
+        
+        availability, teacher_windows = load_day_demand(request.date)
+        plan = solve_schedule(
+            availability,
+            teacher_windows,
+            duration=request.duration_minutes,
+            step=request.step_minutes
+        )
+        
+        return {
+            "success": True,
+            "date": request.date,
+            **plan
         }
         
     except Exception as e:
-        print(f"❌ API Error getting teacher sessions: {e}")
+        logger.exception("❌ API Error solving schedule: %s", e)
         return {
             "success": False,
             "error": str(e),
             "sessions": []
         }
 
+@app.post("/api/split-sessions")
+def split_sessions(request: SplitSessionsRequest):
+    """Plan several sections for one subject when its demand doesn't fit one session"""
+    try:
+        from tools import plan_subject_sections
+        
+        plan = plan_subject_sections(
+            request.subject,
+            request.date,
+            max_class_size=request.max_class_size,
+            max_sections=request.max_sections,
+            session_minutes=request.session_minutes
+        )
+        
+        return {
+            "success": True,
+            "subject": request.subject,
+            "date": request.date,
+            **plan
+        }
+        
+    except Exception as e:
+        logger.exception("❌ API Error splitting sessions: %s", e)
+        return {
+            "success": False,
+            "error": str(e),
+            "sessions": []
+        }
+
+@app.get("/api/events")
+async def session_events(user_id: str, request: Request):
+    """Server-sent stream of changes to this user's sessions (see events.py); replaces polling"""
+    subscription = events.bus.subscribe(user_id, request.headers.get("last-event-id"))
+    
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=events.HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield events.format_sse(event)
+        finally:
+            events.bus.unsubscribe(subscription)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/metrics")
+async def metrics():
+    """Prometheus metrics for this process"""
+    # Re-evaluate the shedding tier so recovery shows up even while no requests arrive
+    shedder.tier()
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def _profiles_allowed(request: Request) -> bool:
+    return bool(profiler.PROFILE_TOKEN) and request.headers.get("x-profile") == profiler.PROFILE_TOKEN
+
+@app.get("/api/debug/profiles")
+async def list_profiles(request: Request):
+    """Recent request profiles (requires the X-Profile token)"""
+    if not _profiles_allowed(request):
+        return Response(status_code=404)
+    profiles = [{k: v for k, v in p.items() if k != "folded"} for p in profiler.recent_profiles.values()]
+    return {"success": True, "profiles": profiles[::-1]}
+
+@app.get("/api/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request):
+    """One profile as collapsed stacks, ready for flamegraph.pl or speedscope"""
+    profile = profiler.recent_profiles.get(profile_id)
+    if not _profiles_allowed(request) or profile is None:
+        return Response(status_code=404)
+    return Response(content=profile["folded"], media_type="text/plain; charset=utf-8")
+
 @app.get("/api/health")
 async def health():
     return {"status": "healthy", "message": "AI Session Scheduler API is running"}
 
+@app.get("/api/ready")
+async def ready():
+    """200 once the startup warmup has finished, 503 before; point the platform health check here"""
+    status = warmup.status()
+    status["startup_seconds"] = startup_report()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up", **status})
+    return {"status": "ready", **status}
+
 @app.get("/")
 async def root():
     return {"message": "AI Session Scheduler API", "status": "running"}
 
 if __name__ == "__main__":
-    print("🚀 Starting AI Session Scheduler...")
-    print("📡 Backend: http://localhost:8000")
-    print("📖 API Docs: http://localhost:8000/docs")
-    
-    uvicorn.run(
-        "api_server:app", 
-        host="0.0.0.0", 
-        port=8000, 
-        reload=True
-    )
\ No newline at end of file
+    # Same launcher as start.py: production workers by default, --dev for auto-reload
+    import start
+    start.main()
\ No newline at end of file
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the scheduling core.
+
+Runs the message parsers and the timing optimizer over a fixed corpus of
+student and teacher messages at several input sizes and reports per-call
+latency and throughput. Results are saved as JSON so two versions can be
+compared; --compare exits non-zero when anything got slower than the threshold.
+
+Usage:
+    python benchmarks.py --output bench-main.json
+    python benchmarks.py --output bench-branch.json --compare bench-main.json --threshold 0.15
+    python benchmarks.py --sizes 1,100 --only parse_time_from_message
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# tools.py refuses to import without credentials; nothing here talks to Supabase or Anthropic
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+logging.disable(logging.INFO)
+
+import tools  # noqa: E402
+
+DEFAULT_SIZES = (1, 10, 100, 1000, 10000)
+
+STUDENT_MESSAGES = [
+    "I want to learn Python from 2-4pm",
+    "Can I get a React session at 3pm?",
+    "need help with machine learning 10am to 12pm",
+    "I want a java class 9-11am",
+    "spring boot lesson please, 1:30-3:30pm",
+    "I need a docker and kubernetes session 6pm",
+    "want to learn pyhton tomorrow 4-5pm",
+    "teach me next.js from 11am to 1pm",
+    "I need a database session, mysql queries, 7-9pm",
+    "flutter mobile app development class at 5pm",
+    "I want to learn vue 2:30-4:30pm",
+    "can you teach me programming",
+    "need a session on data science 9am to 11am",
+    "I want to learn html and css 3-5pm",
+    "javascript and typescript lesson 8pm",
+    "help me learn something fun this weekend",
+    "I want to learn about the frontend 1-2pm",
+    "need AWS deployment help 12pm to 2pm",
+    "I want a tensorflow session 10am",
+    "teach me kotlin for android 6-8pm",
+]
+
+TEACHER_MESSAGES = [
+    "I'm available Friday 2-5 PM for Python sessions",
+    "Available today from 9am to 5pm",
+    "I can teach React 10am-3pm",
+    "I'm free 6-9pm for any subject",
+    "Available 1:30-4:30pm for Java",
+]
+
+CHAT_MESSAGES = (
+    [f"Student student-{i:04d}: {message}" for i, message in enumerate(STUDENT_MESSAGES)]
+    + [f"Teacher {tools.TEACHER_ID}: {message}" for message in TEACHER_MESSAGES]
+    + ["hello there", "ok", "Student abc: thanks!"]
+)
+
+
+def _messages(size: int) -> list:
+    corpus = STUDENT_MESSAGES + TEACHER_MESSAGES
+    return [corpus[i % len(corpus)] for i in range(size)]
+
+
+def _student_timings(size: int) -> list:
+    """size (start, end) pairs taken from the parsed corpus, shifted so they don't all coincide"""
+    base = [tools.parse_time_from_message(message) for message in STUDENT_MESSAGES]
+    timings = []
+    for i in range(size):
+        start, end = base[i % len(base)]
+        shift = (i // len(base)) % 4 * 15
+        start_mins = min(tools.time_to_minutes(start) + shift, 22 * 60)
+        end_mins = min(max(tools.time_to_minutes(end) + shift, start_mins + 30), 24 * 60 - 1)
+        timings.append((tools.minutes_to_time(start_mins), tools.minutes_to_time(end_mins)))
+    return timings
+
+
+# name -> (setup(size) -> inputs, run(inputs) -> None, calls per run)
+BENCHMARKS = {
+    "parse_time_from_message": (
+        _messages,
+        lambda messages: [tools.parse_time_from_message(m) for m in messages],
+        lambda size: size,
+    ),
+    "extract_subject_and_timing_manual": (
+        _messages,
+        lambda messages: [tools.extract_subject_and_timing_manual(m) for m in messages],
+        lambda size: size,
+    ),
+    "extract_user_id_from_message": (
+        lambda size: [CHAT_MESSAGES[i % len(CHAT_MESSAGES)] for i in range(size)],
+        lambda messages: [tools.extract_user_id_from_message(m) for m in messages],
+        lambda size: size,
+    ),
+    "validate_input": (
+        lambda size: [CHAT_MESSAGES[i % len(CHAT_MESSAGES)].split(": ", 1)[-1] for i in range(size)],
+        lambda messages: [tools.validate_input(m) for m in messages],
+        lambda size: size,
+    ),
+    "calculate_optimal_timing": (
+        _student_timings,
+        lambda timings: tools.calculate_optimal_timing(timings),
+        lambda size: 1,
+    ),
+    "calculate_optimal_timing[split]": (
+        _student_timings,
+        lambda timings: tools.calculate_optimal_timing(timings, mode="split"),
+        lambda size: 1,
+    ),
+}
+
+
+def run_benchmark(name: str, size: int, min_time: float = 0.2, repeats: int = 5) -> dict:
+    """Time one benchmark at one size: `repeats` rounds of at least min_time each"""
+    setup, run, calls = BENCHMARKS[name]
+    inputs = setup(size)
+    calls_per_run = calls(size)
+
+    # Calibrate how many runs make up one round
+    run(inputs)
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            run(inputs)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 10 or loops >= 1_000_000:
+            break
+        loops *= 10
+    loops = max(1, int(loops * min_time / max(elapsed, 1e-9) / 10))
+
+    per_call = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(loops):
+            run(inputs)
+        per_call.append((time.perf_counter() - started) / (loops * calls_per_run))
+
+    median = statistics.median(per_call)
+    return {
+        "name": name,
+        "size": size,
+        "calls_per_run": calls_per_run,
+        "loops": loops,
+        "per_call_us": round(median * 1e6, 3),
+        "per_call_min_us": round(min(per_call) * 1e6, 3),
+        "per_call_max_us": round(max(per_call) * 1e6, 3),
+        "calls_per_sec": round(1 / median, 1) if median else None,
+    }
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """Benchmarks whose median per-call latency grew by more than threshold vs the baseline"""
+    previous = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["size"]))
+        if not before or not before["per_call_us"]:
+            continue
+        change = result["per_call_us"] / before["per_call_us"] - 1
+        result["change_vs_baseline"] = round(change, 4)
+        if change > threshold:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the scheduling core")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated input sizes (default 1,10,100,1000,10000)")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS),
+                        help="Run only this benchmark (repeatable)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timing round (default 0.2)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing rounds per benchmark (default 5)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed slowdown vs the baseline before failing (default 0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+    except ValueError:
+        parser.error("--sizes must be comma-separated integers")
+    if any(size < 1 for size in sizes):
+        parser.error("--sizes must be positive")
+    if args.repeats < 1 or args.min_time <= 0:
+        parser.error("--repeats and --min-time must be positive")
+
+    results = []
+    print(f"{'benchmark':<36} {'size':>6} {'per call':>12} {'calls/s':>12}")
+    for name in args.only or BENCHMARKS:
+        for size in sizes:
+            result = run_benchmark(name, size, min_time=args.min_time, repeats=args.repeats)
+            results.append(result)
+            print(f"{name:<36} {size:>6} {result['per_call_us']:>9.2f} us {result['calls_per_sec']:>12,.0f}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for result in regressions:
+            print(f"❌ {result['name']} @ {result['size']}: {result['change_vs_baseline']:+.1%} slower than baseline")
+        if not regressions:
+            print(f"✅ No regressions above {args.threshold:.0%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Credentials and lazily built external clients.
+
+Importing this module only reads the environment. The Supabase client and
+the Anthropic chat models are created on first use (or by the startup
+warmup), so importing the scheduling code stays cheap.
+"""
+import logging
+import os
+import threading
+
+import deadlines
+from load_shedding import shedder
+from metrics import external_call, startup_phase, LLM_OVERLOADED, LLM_IN_FLIGHT, TimedSupabase
+
+# Load environment variables
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    # Fallback if python-dotenv is not available
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Get credentials from environment variables - NO fallbacks for security
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+
+# Validate required environment variables
+if not SUPABASE_URL:
+    raise ValueError("SUPABASE_URL environment variable is required")
+if not SUPABASE_KEY:
+    raise ValueError("SUPABASE_KEY environment variable is required")
+if not ANTHROPIC_API_KEY:
+    raise ValueError("ANTHROPIC_API_KEY environment variable is required")
+
+logger.info("🔧 Using Supabase URL: %s", SUPABASE_URL)
+logger.info("🔧 Using Anthropic API: %s", '✅ Set' if ANTHROPIC_API_KEY else '❌ Missing')
+
+# DESIGNATED TEACHER ID - Only this user can set teacher availability
+TEACHER_ID = 'e4bcab2f-8da5-4a78-85e8-094f4d7ac308'
+
+ANTHROPIC_MODEL = "claude-3-haiku-20240307"
+
+_lock = threading.Lock()
+
+
+class LazySupabase:
+    """Supabase client created on first query; every query's latency is recorded per table"""
+
+    def __init__(self):
+        self._client = None
+
+    def get(self) -> TimedSupabase:
+        if self._client is None:
+            with _lock:
+                if self._client is None:
+                    with startup_phase("supabase_client"):
+                        from supabase import create_client
+                        self._client = TimedSupabase(create_client(SUPABASE_URL, SUPABASE_KEY))
+                    logger.info("✅ Supabase client initialized")
+        return self._client
+
+    def table(self, name: str):
+        client = self.get()
+        hooks = client.postgrest.session.event_hooks["request"]
+        if deadlines.http_timeout_hook not in hooks:
+            # Checked per query: supabase rebuilds its PostgREST client on auth changes
+            hooks.append(deadlines.http_timeout_hook)
+        return client.table(name)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+supabase = LazySupabase()
+
+# Chat models by temperature; each keeps its own pooled HTTP connection
+_chat_models = {}
+
+
+def get_chat_model(temperature: float = 0.1):
+    """Shared ChatAnthropic instance for this temperature, or None if it can't be built"""
+    model = _chat_models.get(temperature)
+    if model is None:
+        with _lock:
+            if temperature not in _chat_models:
+                try:
+                    with startup_phase(f"anthropic_client_t{temperature}"):
+                        from langchain_anthropic import ChatAnthropic
+                        _chat_models[temperature] = ChatAnthropic(
+                            model=ANTHROPIC_MODEL,
+                            temperature=temperature,
+                            api_key=ANTHROPIC_API_KEY
+                        )
+                    logger.info("✅ Anthropic LLM initialized successfully")
+                except Exception as e:
+                    logger.warning("⚠️ Anthropic LLM initialization failed: %s", e)
+                    _chat_models[temperature] = None
+            model = _chat_models[temperature]
+    return model
+
+
+def get_llm():
+    """The agent's Claude model (temperature 0.1), or None if it can't be built"""
+    return get_chat_model(0.1)
+
+
+def invoke_llm(model, prompt: str, operation: str):
+    """Call an Anthropic model within the request's time budget, recording its latency,
+    any 529/overloaded error and the outcome load shedding watches"""
+    deadlines.check(f"anthropic.{operation}", deadlines.MIN_LLM_SECONDS)
+    options = {}
+    left = deadlines.remaining()
+    if left is not None:
+        # The SDK retries 529s and timeouts on its own, backing off 0.5 s, 1 s, ... in between;
+        # size each attempt so all of them fit in what is left
+        retries = getattr(model, "max_retries", 0)
+        backoff = sum(min(0.5 * 2 ** attempt, 8.0) for attempt in range(retries))
+        options["timeout"] = max(left - backoff, deadlines.MIN_LLM_SECONDS) / (retries + 1)
+    LLM_IN_FLIGHT.inc()
+    try:
+        with external_call("anthropic", operation):
+            response = model.invoke(prompt, **options)
+        shedder.record_llm_call(failed=False)
+        return response
+    except Exception as e:
+        shedder.record_llm_call(failed=True)
+        if "529" in str(e) or "overloaded" in str(e).lower():
+            LLM_OVERLOADED.inc(stage=operation)
+        raise
+    finally:
+        LLM_IN_FLIGHT.dec()
@@ -0,0 +1,101 @@
+"""
+Per-request time budgets.
+
+A chat request gets REQUEST_DEADLINE seconds, or what the caller asks for in
+the X-Request-Timeout header (capped at REQUEST_DEADLINE_MAX). The budget
+lives in a context variable, so everything below run_session_agent sees it
+without passing it through signatures:
+
+- run_session_agent checks it before each write stage and stops with
+  DeadlineExceeded (nothing written yet, so a retry is safe);
+- invoke_llm won't start an Anthropic call with less than MIN_LLM_SECONDS
+  left, which sends the caller down its existing non-LLM fallback, and gives
+  the call what is left as its timeout, split across the SDK's retries;
+- Supabase requests get the remaining budget as their HTTP timeout, but never
+  less than MIN_DB_SECONDS, so a tool that has started writing can finish.
+
+The endpoint cancels the budget when the client disconnects, which counts as
+expired from then on.
+
+Environment:
+    REQUEST_DEADLINE      seconds per chat request (default 25, under the frontend's 30 s abort)
+    REQUEST_DEADLINE_MAX  largest X-Request-Timeout accepted (default 120)
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "25"))
+REQUEST_DEADLINE_MAX = float(os.getenv("REQUEST_DEADLINE_MAX", "120"))
+
+MIN_LLM_SECONDS = 1.0
+MIN_DB_SECONDS = 2.0
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+class Deadline:
+    __slots__ = ("expires_at", "cancelled")
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        return 0.0 if self.cancelled else max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self):
+        """The client has gone; nothing more is worth doing"""
+        self.cancelled = True
+
+
+_current = ContextVar("deadline", default=None)
+
+
+def budget_seconds(header: str = None) -> float:
+    """Budget for a request: the X-Request-Timeout header if it is a positive number, else REQUEST_DEADLINE"""
+    try:
+        seconds = float(header) if header else REQUEST_DEADLINE
+    except ValueError:
+        seconds = REQUEST_DEADLINE
+    return min(seconds, REQUEST_DEADLINE_MAX) if seconds > 0 else REQUEST_DEADLINE
+
+
+@contextmanager
+def start(seconds: float):
+    """Run the block (and threads started with its copied context) under a budget"""
+    deadline = Deadline(seconds)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def remaining():
+    """Seconds left in the current budget, or None outside one"""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def check(operation: str, min_seconds: float = 0.0):
+    """Raise DeadlineExceeded if less than min_seconds of the budget is left"""
+    left = remaining()
+    if left is not None and left <= min_seconds:
+        deadline = _current.get()
+        reason = "client disconnected" if deadline.cancelled else "deadline exceeded"
+        raise DeadlineExceeded(f"{reason} before {operation}")
+
+
+def http_timeout_hook(request):
+    """httpx request hook: cap the request's timeouts at the remaining budget (at least MIN_DB_SECONDS)"""
+    left = remaining()
+    if left is None:
+        return
+    seconds = max(left, MIN_DB_SECONDS)
+    current = request.extensions.get("timeout") or {}
+    request.extensions["timeout"] = {key: min(current.get(key) or seconds, seconds)
+                                     for key in ("connect", "read", "write", "pool")}
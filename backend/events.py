@@ -0,0 +1,135 @@
+"""
+In-process event bus for session changes, streamed to clients over SSE.
+
+The write paths in tools.py publish one event per change, each carrying only
+the changed session (or availability row), addressed to the users it
+concerns: the teacher plus the session's students. /api/events subscribers
+receive the events addressed to them; clients merge sessions by id instead
+of refetching the whole list.
+
+Event types:
+    session.created               {"session": row}
+    session.updated               {"session": row}
+    session.removed               {"session_id", "status"}  (left, cancelled or emptied)
+    teacher_availability.updated  {"availability": {"date", "start_time", "end_time"}}  (everyone)
+    job.finished                  {"job": record}  (an async chat job's result, see jobs.py)
+    resync                        {}  (events were missed; refetch once)
+
+Event ids are "<process token>-<sequence>". A reconnecting client sends its
+last id (Last-Event-ID) and gets the events it missed from a short history;
+if they're gone, or the id comes from another process (restart, another
+worker), it gets "resync". Each worker process has its own bus, so a stream
+only sees changes made by requests to the same worker.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+
+from metrics import EVENTS_PUBLISHED, EVENT_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 1000
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+
+class Subscription:
+    """One open stream: the events addressed to user_id, queued on the stream's event loop"""
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def _deliver(self, event: dict):
+        if self.queue.full():
+            # A client this far behind refetches once instead of replaying the backlog
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {"id": event["id"], "type": "resync", "data": {}}
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self.token = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._history = deque(maxlen=history_size)  # (sequence, audience, event)
+        self._subscribers = {}  # user_id -> set of Subscription
+        self._listeners = []
+
+    def publish(self, event_type: str, data: dict, audience=None) -> dict:
+        """Send an event to the given user ids (None = everyone); safe from any thread"""
+        audience = frozenset(audience) if audience is not None else None
+        with self._lock:
+            self._sequence += 1
+            event = {"id": f"{self.token}-{self._sequence}", "type": event_type, "data": data, "ts": round(time.time(), 3)}
+            self._history.append((self._sequence, audience, event))
+            if audience is None:
+                targets = [sub for subs in self._subscribers.values() for sub in subs]
+            else:
+                targets = [sub for user_id in audience for sub in self._subscribers.get(user_id, ())]
+        EVENTS_PUBLISHED.inc(type=event_type)
+        for listener in self._listeners:
+            try:
+                listener(event, audience)
+            except Exception as e:
+                logger.warning("⚠️ Event listener failed on %s: %s", event_type, e)
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, event)
+            except RuntimeError:
+                # The stream's loop has shut down; its finally block unsubscribes it
+                pass
+        return event
+
+    def add_listener(self, listener):
+        """Call listener(event, audience) synchronously for every published event"""
+        self._listeners.append(listener)
+
+    def subscribe(self, user_id: str, last_event_id: str = None) -> Subscription:
+        """Open a subscription (call from the stream's event loop), replaying what
+        the user missed since last_event_id"""
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+            missed = self._missed(user_id, last_event_id) if last_event_id else []
+        EVENT_SUBSCRIBERS.inc()
+        for event in missed[-SUBSCRIBER_QUEUE_SIZE:]:
+            sub._deliver(event)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is None or sub not in subs:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.user_id]
+        EVENT_SUBSCRIBERS.dec()
+
+    def _missed(self, user_id: str, last_event_id: str) -> list:
+        token, _, sequence = last_event_id.partition("-")
+        resync = [{"id": f"{self.token}-{self._sequence}", "type": "resync", "data": {}}]
+        if token != self.token or not sequence.isdigit():
+            return resync
+        sequence = int(sequence)
+        if self._history and self._history[0][0] > sequence + 1:
+            return resync
+        return [event for seq, audience, event in self._history
+                if seq > sequence and (audience is None or user_id in audience)]
+
+
+def format_sse(event: dict) -> str:
+    """One event in text/event-stream framing"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+bus = EventBus()
@@ -0,0 +1,203 @@
+"""
+Idempotency keys for /api/chat-session.
+
+A client that retries a message sends the same key again, in the
+Idempotency-Key header or the idempotency_key field. The first request with
+a key runs the agent; its completed response is kept for IDEMPOTENCY_TTL
+seconds and replays get it back as-is, without another Anthropic call or
+Supabase write. A replay that arrives while the first request is still
+running waits for that request's response (for up to its own request
+budget) instead of starting a second run.
+
+Keys are scoped to the user and bound to the message: reusing a key for a
+different message is an error. Failed responses are not kept, so a retry
+after a failure runs again.
+
+Claims and responses are records in IDEMPOTENCY_DIR (one file per hashed
+key), like job records in JOB_DIR, so every worker process on the host sees
+them. A key is claimed under a file lock, so two workers never both run it.
+Replays on the worker that owns the claim are woken directly; replays on
+other workers poll the record. A claim whose worker died is given up after
+the longest request deadline.
+
+Environment:
+    IDEMPOTENCY_TTL  seconds a completed response is replayed (default 600)
+    IDEMPOTENCY_DIR  directory for claim records (default: <tmp>/scheduler-idempotency)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only this process's lock is held, which is enough for one worker
+    fcntl = None
+
+import deadlines
+from metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "600"))
+IDEMPOTENCY_DIR = os.getenv("IDEMPOTENCY_DIR") or os.path.join(tempfile.gettempdir(), "scheduler-idempotency")
+MAX_KEY_LENGTH = 255
+
+# A running claim older than any request can run belongs to a worker that died
+RUNNING_STALE = deadlines.REQUEST_DEADLINE_MAX + 30
+LOCK_STRIPES = 64
+POLL_INTERVAL = 0.25
+PURGE_INTERVAL = 60
+
+
+def fingerprint(*parts) -> str:
+    """Hash of the request fields a key is bound to"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class Claim:
+    """One key's request: its owner runs it and calls finish(), anyone else waits for it"""
+    __slots__ = ("key", "id", "fingerprint", "path")
+
+    def __init__(self, key: str, claim_id: str, fingerprint: str, path: str = None):
+        self.key = key
+        self.id = claim_id
+        self.fingerprint = fingerprint
+        self.path = path  # None when IDEMPOTENCY_DIR can't be written
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, directory: str = IDEMPOTENCY_DIR):
+        self.ttl = ttl
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._futures = {}  # claim id -> Future, for the claims this process owns
+        self._ready = False
+        self._purged_at = time.monotonic()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest()[:40] + ".json")
+
+    @contextmanager
+    def _locked(self, path: str):
+        """Hold the lock for a record: this process's lock, then a file lock other workers share"""
+        with self._lock:
+            if not self._ready:
+                os.makedirs(self.directory, exist_ok=True)
+                self._ready = True
+            if fcntl is None:
+                yield
+                return
+            stripe = int(os.path.basename(path)[:8], 16) % LOCK_STRIPES
+            with open(os.path.join(self.directory, f"lock-{stripe}"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def _read(self, path: str):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path: str, record: dict):
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(record, f, default=str)
+        os.replace(f"{path}.tmp", path)
+
+    def _holds_key(self, record, now: float) -> bool:
+        if record is None:
+            return False
+        if record["status"] == "running":
+            return record["claimed_at"] > now - RUNNING_STALE
+        return record["status"] == "done" and record["expires_at"] > now
+
+    def claim(self, key: str, fingerprint: str) -> tuple:
+        """(claim, owner). The owner runs the request and calls finish(); anyone
+        else waits for the response with wait() (after checking the fingerprint)"""
+        self._purge()
+        path = self._path(key)
+        claim = Claim(key, secrets.token_hex(8), fingerprint, path)
+        try:
+            with self._locked(path):
+                record = self._read(path)
+                now = time.time()
+                if self._holds_key(record, now):
+                    CACHE_HITS.inc(cache="idempotency")
+                    return Claim(key, record["id"], record["fingerprint"], path), False
+                CACHE_MISSES.inc(cache="idempotency")
+                self._write(path, {"id": claim.id, "fingerprint": fingerprint, "status": "running", "claimed_at": now})
+                self._futures[claim.id] = Future()
+        except OSError as e:
+            logger.warning("⚠️ Idempotency store unavailable, running without it: %s", e)
+            claim.path = None
+            with self._lock:
+                self._futures[claim.id] = Future()
+        return claim, True
+
+    def finish(self, claim: Claim, response: dict, keep: bool = True):
+        """Resolve a claim; kept responses are replayed until the TTL runs out.
+        A claim that is already resolved is left as it is"""
+        with self._lock:
+            future = self._futures.pop(claim.id, None)
+        if future is None:
+            return
+        if claim.path is not None:
+            try:
+                with self._locked(claim.path):
+                    record = self._read(claim.path)
+                    # A claim given up as stale may have been taken over since
+                    if record is not None and record["id"] == claim.id:
+                        # Released records still answer the replays already waiting, but free the key
+                        self._write(claim.path, {**record, "status": "done" if keep else "released",
+                                                 "expires_at": time.time() + self.ttl, "response": response})
+            except OSError as e:
+                logger.warning("⚠️ Could not save idempotent response for claim %s: %s", claim.id, e)
+        future.set_result(response)
+
+    async def wait(self, claim: Claim, timeout: float):
+        """The response for someone else's claim once it is finished, or None after timeout seconds"""
+        with self._lock:
+            future = self._futures.get(claim.id)
+        if future is not None:
+            try:
+                # shield: a replay that disconnects or times out must not cancel the shared future
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        deadline = time.monotonic() + timeout
+        while True:
+            record = self._read(claim.path)
+            if record is not None and record["status"] != "running":
+                return record["response"]
+            if record is None or time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _purge(self):
+        now = time.monotonic()
+        if now - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = now
+        # Records are rewritten when they change, so anything older has expired or was abandoned
+        cutoff = time.time() - max(self.ttl, RUNNING_STALE)
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                        with self._locked(entry.path):
+                            if os.stat(entry.path).st_mtime < cutoff:
+                                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+store = IdempotencyStore()
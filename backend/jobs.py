@@ -0,0 +1,252 @@
+"""
+Background jobs for /api/chat-session.
+
+With "async_job": true (or "Prefer: respond-async") the endpoint queues the
+message and answers 202 with a job id straight away. A pool of JOB_WORKERS
+workers runs run_session_agent, so slow LLM calls no longer hold the HTTP
+connection (and the proxy's 30 s timeout) open. Clients poll
+GET /api/jobs/{id} (?wait=<seconds> long-polls), stream
+GET /api/jobs/{id}/events, or pick up the "job.finished" event on their
+/api/events stream.
+
+Workers are threads by default. JOB_WORKER_MODE=process runs jobs in a
+process pool instead; each process builds its own clients, and the session
+events its jobs publish stay in that process, so SSE streams and session
+indexes only see those changes on their TTL reload.
+
+Job records are written to JOB_DIR as well as kept in memory, so every
+worker process on the host can answer for a job queued by another: when it
+is queued, when a pool worker starts it and when it finishes. Finished jobs
+stay available for JOB_TTL seconds.
+
+Environment:
+    JOB_WORKERS      worker threads or processes (default 4)
+    JOB_WORKER_MODE  "thread" (default) or "process"
+    JOB_QUEUE_LIMIT  unfinished jobs accepted before new ones get 503 (default 1000)
+    JOB_TTL          seconds a finished job stays available (default 600)
+    JOB_DIR          directory for job records (default: <tmp>/scheduler-jobs)
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import deadlines
+import events
+import recorder
+from metrics import JOBS_PENDING, JOBS_FINISHED
+from tracing import start_trace
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_WORKER_MODE = os.getenv("JOB_WORKER_MODE", "thread")
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "1000"))
+JOB_TTL = float(os.getenv("JOB_TTL", "600"))
+JOB_DIR = os.getenv("JOB_DIR") or os.path.join(tempfile.gettempdir(), "scheduler-jobs")
+
+FINISHED = ("done", "failed")
+PURGE_INTERVAL = 60
+_JOB_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+def chat_result(message: str, user_id: str, is_teacher: bool) -> dict:
+    """Run one chat message through the agent; the /api/chat-session response body"""
+    try:
+        # Lazy import to reduce startup time
+        from tools import run_session_agent
+
+        role = "Teacher" if is_teacher else "Student"
+        response = run_session_agent(f"{role} {user_id}: {message}")
+        return {"success": True, "response": response, "user_id": user_id, "is_teacher": is_teacher}
+    except deadlines.DeadlineExceeded as e:
+        logger.warning("⏱️ Chat request stopped: %s", e)
+        return {"success": False, "response": "⏱️ That took too long. Please send your message again.",
+                "error": str(e), "user_id": user_id, "is_teacher": is_teacher}
+    except Exception as e:
+        logger.exception("❌ API Error: %s", e)
+        return {"success": False, "response": "✅ I understand! Let me help you.", "user_id": user_id, "is_teacher": is_teacher}
+
+
+def _write_record(path: str, record: dict):
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(record, f, default=str)
+    os.replace(f"{path}.tmp", path)
+
+
+def _execute(payload: dict, trace_id: str = None, budget: float = deadlines.REQUEST_DEADLINE,
+             record_path: str = None, record: dict = None) -> dict:
+    """Worker entry point, in a pool thread or process; spans join the queuing request's trace
+    and the time budget starts when the job does"""
+    if record_path:
+        # Other worker processes only see JOB_DIR, and can't tell a started job from a queued one otherwise
+        try:
+            _write_record(record_path, {**record, "status": "running"})
+        except OSError as e:
+            logger.warning("⚠️ Could not write job %s: %s", record.get("id"), e)
+    with start_trace("job /api/chat-session", trace_id=trace_id, endpoint="/api/chat-session"), deadlines.start(budget):
+        result = chat_result(payload["message"], payload["user_id"], payload["is_teacher"])
+        recorder.record("/api/chat-session", payload, result)
+    return result
+
+
+class Job:
+    __slots__ = ("id", "user_id", "created_at", "finished_at", "future", "result")
+
+    def __init__(self, user_id: str):
+        self.id = secrets.token_urlsafe(16)
+        self.user_id = user_id
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self.result = None
+
+    @property
+    def status(self) -> str:
+        if self.result is not None:
+            return "done" if self.result.get("success") else "failed"
+        return "running" if self.future is not None and self.future.running() else "queued"
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "status": self.status, "user_id": self.user_id,
+                "created_at": round(self.created_at, 3),
+                "finished_at": round(self.finished_at, 3) if self.finished_at else None,
+                "result": self.result}
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, mode: str = JOB_WORKER_MODE, limit: int = JOB_QUEUE_LIMIT,
+                 ttl: float = JOB_TTL, directory: str = JOB_DIR):
+        self.workers = workers
+        self.mode = mode
+        self.limit = limit
+        self.ttl = ttl
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs = {}  # job_id -> Job
+        self._purged_at = time.monotonic()
+
+    def _pool(self):
+        if self._executor is None:
+            if self.mode == "process":
+                # spawn: forked children would inherit the parent's client threads and locks
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+            os.makedirs(self.directory, exist_ok=True)
+            logger.info("🧵 Job pool started: %s %s workers", self.workers, self.mode)
+        return self._executor
+
+    def pending(self) -> int:
+        """Jobs queued or running in this process"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.result is None)
+
+    def submit(self, payload: dict, trace_id: str = None, budget: float = deadlines.REQUEST_DEADLINE) -> Job:
+        """Queue a chat message ({"message", "user_id", "is_teacher"}); raises QueueFull at JOB_QUEUE_LIMIT"""
+        self._purge()
+        if self.pending() >= self.limit:
+            raise QueueFull(f"{self.limit} jobs already pending")
+        job = Job(payload["user_id"])
+        with self._lock:
+            pool = self._pool()
+        # Written before the job can start, so it never replaces the worker's "running" record
+        self._write(job)
+        job.future = pool.submit(_execute, payload, trace_id, budget, self._path(job.id), job.to_dict())
+        JOBS_PENDING.inc()
+        # Registered before the job is visible, so waiters always see the finished record
+        job.future.add_done_callback(lambda future: self._finished(job, future))
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def _finished(self, job: Job, future):
+        if future.cancelled():
+            result = {"success": False, "error": "Job was cancelled before it ran"}
+        elif future.exception() is not None:
+            logger.error("❌ Job %s failed: %s", job.id, future.exception())
+            result = {"success": False, "error": str(future.exception())}
+        else:
+            result = future.result()
+        job.finished_at = time.time()
+        job.result = result
+        JOBS_PENDING.dec()
+        JOBS_FINISHED.inc(status=job.status)
+        self._write(job)
+        events.bus.publish("job.finished", {"job": job.to_dict()}, audience=[job.user_id])
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, job: Job):
+        try:
+            _write_record(self._path(job.id), job.to_dict())
+        except OSError as e:
+            logger.warning("⚠️ Could not write job %s: %s", job.id, e)
+
+    def get(self, job_id: str):
+        """The job's record, from memory or from JOB_DIR (queued by another worker process); None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    async def wait(self, job_id: str, timeout: float):
+        """The job's record once it has finished, or as it stands after timeout seconds"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            # asyncio.wait never cancels the job's future, even if this request goes away
+            await asyncio.wait({asyncio.wrap_future(job.future)}, timeout=timeout)
+            return job.to_dict()
+        deadline = time.monotonic() + timeout
+        record = self.get(job_id)
+        while record is not None and record["status"] not in FINISHED and time.monotonic() < deadline:
+            await asyncio.sleep(0.25)
+            record = self.get(job_id)
+        return record
+
+    def _purge(self):
+        now = time.monotonic()
+        if now - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = now
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+    def shutdown(self):
+        """Let running jobs finish; jobs still queued are marked failed"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+queue = JobQueue()
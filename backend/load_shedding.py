@@ -0,0 +1,128 @@
+"""
+Automatic load shedding: drop optional LLM calls before requests start
+timing out.
+
+    tier 0  full service
+    tier 1  create_new_session/update_existing_session skip the optimizer LLM
+            call; calculate_optimal_timing applies the same majority rule
+    tier 2  subject/time extraction also skips the LLM (cached results are
+            still used) and falls back to the manual parser
+
+The tier follows three signals: chat jobs pending (jobs.py), Anthropic calls
+in flight, and the share of Anthropic calls that failed in the last
+SHED_WINDOW seconds. Each has a tier-1 and a tier-2 threshold and the highest
+tier reached wins. Stepping up is immediate; stepping down waits until the
+signals have stayed below the current tier for SHED_COOLDOWN seconds, so
+full service comes back on its own once the pressure is gone (failures stop
+counting once they are older than SHED_WINDOW). Signals are per process,
+like the metrics they come from.
+
+Environment:
+    SHED_ENABLED         0 disables shedding (default 1)
+    SHED_QUEUE_DEPTH     pending jobs for tier 1,2 (default "20,50")
+    SHED_LLM_IN_FLIGHT   concurrent Anthropic calls for tier 1,2 (default "8,16")
+    SHED_LLM_ERROR_RATE  failed share of recent Anthropic calls for tier 1,2 (default "0.2,0.5")
+    SHED_WINDOW          seconds of Anthropic outcomes counted (default 30)
+    SHED_COOLDOWN        seconds below a tier before stepping down (default 15)
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import JOBS_PENDING, LLM_IN_FLIGHT, SHED_TIER, SHED_TRANSITIONS, SHED_SKIPS
+
+logger = logging.getLogger(__name__)
+
+
+def _thresholds(name: str, default: str) -> tuple:
+    tier1, tier2 = (float(part) for part in os.getenv(name, default).split(","))
+    return tier1, tier2
+
+
+SHED_ENABLED = os.getenv("SHED_ENABLED", "1") != "0"
+SHED_QUEUE_DEPTH = _thresholds("SHED_QUEUE_DEPTH", "20,50")
+SHED_LLM_IN_FLIGHT = _thresholds("SHED_LLM_IN_FLIGHT", "8,16")
+SHED_LLM_ERROR_RATE = _thresholds("SHED_LLM_ERROR_RATE", "0.2,0.5")
+SHED_WINDOW = float(os.getenv("SHED_WINDOW", "30"))
+SHED_COOLDOWN = float(os.getenv("SHED_COOLDOWN", "15"))
+
+# Error rates over fewer calls than this are noise (one failure out of two is not an outage)
+MIN_ERROR_SAMPLES = 10
+MAX_OUTCOMES = 10000
+
+# Lowest tier at which each optional LLM stage is skipped
+STAGE_TIERS = {"optimize": 1, "extract": 2}
+
+
+def _level(value: float, thresholds: tuple) -> int:
+    return 2 if value >= thresholds[1] else 1 if value >= thresholds[0] else 0
+
+
+class LoadShedder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=MAX_OUTCOMES)  # (monotonic time, failed)
+        self._tier = 0
+        self._calm_since = None  # when the signals last dropped below the current tier
+        SHED_TIER.set(0)
+
+    def record_llm_call(self, failed: bool):
+        with self._lock:
+            self._outcomes.append((time.monotonic(), failed))
+
+    def error_rate(self, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._outcomes and self._outcomes[0][0] < now - SHED_WINDOW:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, failed in self._outcomes if failed)
+        return failures / calls if calls >= MIN_ERROR_SAMPLES else 0.0
+
+    def signals(self) -> dict:
+        return {
+            "queue_depth": JOBS_PENDING.value(),
+            "llm_in_flight": LLM_IN_FLIGHT.value(),
+            "llm_error_rate": round(self.error_rate(), 3),
+        }
+
+    def tier(self) -> int:
+        """Current tier, re-evaluated from the signals"""
+        if not SHED_ENABLED:
+            return 0
+        signals = self.signals()
+        wanted = max(_level(signals["queue_depth"], SHED_QUEUE_DEPTH),
+                     _level(signals["llm_in_flight"], SHED_LLM_IN_FLIGHT),
+                     _level(signals["llm_error_rate"], SHED_LLM_ERROR_RATE))
+        now = time.monotonic()
+        with self._lock:
+            previous = self._tier
+            if wanted >= previous:
+                self._calm_since = None
+                self._tier = wanted
+            elif self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= SHED_COOLDOWN:
+                self._calm_since = None
+                self._tier = wanted
+            tier = self._tier
+        if tier != previous:
+            SHED_TIER.set(tier)
+            SHED_TRANSITIONS.inc(from_tier=str(previous), to_tier=str(tier))
+            if tier > previous:
+                logger.warning("🚦 Load shedding tier %s → %s (%s)", previous, tier, signals)
+            else:
+                logger.info("🚦 Load shedding tier %s → %s, recovering (%s)", previous, tier, signals)
+        return tier
+
+    def skip(self, stage: str) -> bool:
+        """True when the current tier sheds this optional LLM stage ("optimize", "extract")"""
+        if self.tier() < STAGE_TIERS[stage]:
+            return False
+        SHED_SKIPS.inc(stage=stage)
+        return True
+
+
+shedder = LoadShedder()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test without a network.
+
+Starts a local stand-in for Supabase (enough of the PostgREST API for the
+queries tools.py makes, kept in memory) and for the Anthropic Messages API
+(configurable latency and 529 rate), launches api_server under uvicorn
+against them, then drives /api/chat-session and /api/teacher-sessions with
+concurrent clients and reports throughput and p50/p95/p99 latency.
+
+Usage:
+    python loadtest.py --requests 500 --concurrency 16
+    python loadtest.py --workers 4 --llm-latency-ms 800 --llm-overload-rate 0.05
+    python loadtest.py --target http://localhost:8000 --requests 100   # existing server, no fakes
+    python loadtest.py --async-jobs --job-workers 8   # chat via job mode; latency is submit to result
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+from subjects import PRIORITY_KEYWORDS
+from workload import generate_workload
+
+
+# === Supabase stand-in (PostgREST subset) ===
+
+def _as_text(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class FakeStore:
+    """In-memory tables answering PostgREST eq/neq/is/in/gte/lte filters, order, insert, update and delete"""
+
+    def __init__(self):
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def _matching(self, rows: list, filters: list) -> list:
+        matched = rows
+        for column, condition in filters:
+            op, _, value = condition.partition(".")
+            if op == "eq":
+                matched = [row for row in matched if _as_text(row.get(column)) == value]
+            elif op == "neq":
+                matched = [row for row in matched if _as_text(row.get(column)) != value]
+            elif op == "is":
+                matched = [row for row in matched if _as_text(row.get(column)) == value]
+            elif op == "in":
+                values = {v.strip('"') for v in value.strip("()").split(",")}
+                matched = [row for row in matched if _as_text(row.get(column)) in values]
+            elif op == "gte":
+                matched = [row for row in matched if row.get(column) is not None and _as_text(row.get(column)) >= value]
+            elif op == "lte":
+                matched = [row for row in matched if row.get(column) is not None and _as_text(row.get(column)) <= value]
+            else:
+                raise ValueError(f"unsupported filter {column}={condition}")
+        return matched
+
+    def handle(self, method: str, table: str, params: list, body):
+        filters = [(k, v) for k, v in params if k not in ("select", "order", "limit", "columns", "on_conflict")]
+        with self._lock:
+            rows = self.tables.setdefault(table, [])
+            if method == "GET":
+                result = [dict(row) for row in self._matching(rows, filters)]
+                for key, value in params:
+                    if key == "order":
+                        for term in reversed(value.split(",")):
+                            column, _, direction = term.partition(".")
+                            result.sort(key=lambda row: _as_text(row.get(column)), reverse=direction.startswith("desc"))
+                    elif key == "limit":
+                        result = result[:int(value)]
+                return result
+            if method == "POST":
+                inserted = []
+                for item in body if isinstance(body, list) else [body]:
+                    row = {"id": str(uuid.uuid4()), "created_at": datetime.now().isoformat(), **item}
+                    rows.append(row)
+                    inserted.append(dict(row))
+                return inserted
+            if method == "PATCH":
+                updated = self._matching(rows, filters)
+                for row in updated:
+                    row.update(body)
+                return [dict(row) for row in updated]
+            if method == "DELETE":
+                removed = self._matching(rows, filters)
+                removed_ids = {id(row) for row in removed}
+                self.tables[table] = [row for row in rows if id(row) not in removed_ids]
+                return [dict(row) for row in removed]
+        raise ValueError(f"unsupported method {method}")
+
+
+# === Anthropic stand-in ===
+
+def _clock(hour: str, minute: str, ampm: str) -> str:
+    hour = int(hour) % 12 + (12 if ampm == "pm" else 0)
+    return f"{hour:02d}:{minute or '00'}:00"
+
+
+def fake_llm_reply(prompt: str) -> str:
+    """Answers the scheduler's prompts in the formats tools.py parses"""
+    if "START_TIME:" in prompt:
+        quoted = re.search(r'message:\s*"(.*?)"', prompt, re.S)
+        message = (quoted.group(1) if quoted else prompt).lower()
+        subject = next((s for keyword, s in PRIORITY_KEYWORDS if keyword in message), "UNCLEAR")
+        start, end = "14:00:00", "15:00:00"
+        span = re.search(r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s*(?:-|to)\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)', message)
+        single = re.search(r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)', message)
+        if span:
+            start = _clock(span.group(1), span.group(2), span.group(3) or span.group(6))
+            end = _clock(span.group(4), span.group(5), span.group(6))
+        elif single:
+            start = _clock(single.group(1), single.group(2), single.group(3))
+            end = f"{int(start[:2]) + 1:02d}{start[2:]}"
+        return f"SUBJECT: {subject}\nSTART_TIME: {start}\nEND_TIME: {end}"
+    if "OPTIMAL_TIME:" in prompt:
+        votes = Counter(re.findall(r'^\S+: (\d{2}:\d{2}-\d{2}:\d{2})$', prompt, re.M))
+        if votes:
+            window, count = votes.most_common(1)[0]
+            return f"VOTE_ANALYSIS: {dict(votes)}\nOPTIMAL_TIME: {window}\nMAJORITY_COUNT: {count}\nREASONING: majority"
+    return "python"
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeBackends/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        config = self.server.config
+
+        if url.path.startswith("/rest/v1/"):
+            if config.db_latency:
+                time.sleep(config.db_latency)
+            try:
+                rows = config.store.handle(self.command, url.path[len("/rest/v1/"):], parse_qsl(url.query), body)
+            except ValueError as e:
+                return self._send(400, {"message": str(e)})
+            return self._send(201 if self.command == "POST" else 200, rows)
+
+        if url.path.endswith("/v1/messages") and self.command == "POST":
+            if config.llm_latency:
+                time.sleep(random.expovariate(1 / config.llm_latency))
+            if random.random() < config.llm_overload_rate:
+                return self._send(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+            prompt = "\n".join(
+                block if isinstance(block, str) else block.get("text", "")
+                for message in body.get("messages", [])
+                for block in (message["content"] if isinstance(message["content"], list) else [message["content"]])
+            )
+            return self._send(200, {
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": body.get("model", "fake"),
+                "content": [{"type": "text", "text": fake_llm_reply(prompt)}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": len(prompt) // 4, "output_tokens": 20},
+            })
+
+        if url.path.endswith("/v1/models") and self.command == "GET":
+            # The startup warmup lists models to open the Anthropic connection
+            return self._send(200, {"data": [{"type": "model", "id": "fake", "display_name": "Fake",
+                                              "created_at": "2024-01-01T00:00:00Z"}],
+                                    "has_more": False, "first_id": "fake", "last_id": "fake"})
+
+        self._send(404, {"message": f"no fake for {self.command} {url.path}"})
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class FakeConfig:
+    def __init__(self, db_latency: float = 0.0, llm_latency: float = 0.0, llm_overload_rate: float = 0.0):
+        self.store = FakeStore()
+        self.db_latency = db_latency
+        self.llm_latency = llm_latency
+        self.llm_overload_rate = llm_overload_rate
+
+
+def start_fakes(config: FakeConfig, port: int = 0) -> ThreadingHTTPServer:
+    """Serve the Supabase and Anthropic stand-ins from one background HTTP server"""
+    server = _FakeServer(("127.0.0.1", port), _FakeHandler)
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="fake-backends", daemon=True).start()
+    return server
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api_server(fake_url: str, port: int, workers: int, extra_env: dict = None) -> subprocess.Popen:
+    """Launch api_server under uvicorn pointed at the fakes and wait until it has warmed up"""
+    env = dict(os.environ,
+               SUPABASE_URL=fake_url,
+               SUPABASE_KEY="loadtest",
+               ANTHROPIC_API_KEY="loadtest",
+               ANTHROPIC_API_URL=fake_url,
+               LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+               **(extra_env or {}))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"api_server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/ready", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("api_server did not become ready within 60 s")
+
+
+# === Load driver ===
+
+def build_workload(n: int, teacher_ratio: float, students: int, days: int, overlap: float, seed: int,
+                   async_jobs: bool = False) -> tuple:
+    """(setup, workload): the teacher's availability messages, then n (endpoint, payload)
+    pairs where teacher_ratio of them list the teacher's sessions"""
+    generated = generate_workload(students=students, days=days, overlap=overlap, seed=seed)
+    chat = [{k: m[k] for k in ("message", "user_id", "is_teacher")} for m in generated["messages"]]
+    setup = [m for m in chat if m["is_teacher"]]
+    requests = [m for m in chat if not m["is_teacher"]]
+    teacher_id = setup[0]["user_id"]
+
+    rng = random.Random(seed)
+    workload = []
+    for i in range(n):
+        if rng.random() < teacher_ratio:
+            workload.append(("/api/teacher-sessions", {"teacher_id": teacher_id, "filter_type": "today_future"}))
+        else:
+            workload.append(("/api/chat-session", {**requests[i % len(requests)], "async_job": async_jobs}))
+    return setup, workload
+
+
+async def drive(base_url: str, workload: list, concurrency: int, timeout: float) -> dict:
+    """Send the workload with `concurrency` requests in flight; latencies and failures per endpoint"""
+    results = {}
+    queue = asyncio.Queue()
+    for item in workload:
+        queue.put_nowait(item)
+
+    async def client_loop(client):
+        while not queue.empty():
+            endpoint, payload = queue.get_nowait()
+            stats = results.setdefault(endpoint, {"latencies": [], "errors": 0})
+            started = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=payload)
+                if response.status_code == 202:
+                    # Async job: wait for it to finish; latency covers queueing and running
+                    job = {"status": "queued"}
+                    while job["status"] not in ("done", "failed"):
+                        job = (await client.get(response.json()["status_url"], params={"wait": 30})).json()["job"]
+                    ok = job["status"] == "done"
+                else:
+                    ok = response.status_code == 200 and response.json().get("success", False)
+            except (httpx.HTTPError, ValueError):
+                ok = False
+            stats["latencies"].append(time.perf_counter() - started)
+            if not ok:
+                stats["errors"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "endpoints": results}
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(run: dict) -> dict:
+    summary = {"elapsed_s": round(run["elapsed"], 3), "endpoints": {}}
+    total = 0
+    for endpoint, stats in sorted(run["endpoints"].items()):
+        latencies = stats["latencies"]
+        total += len(latencies)
+        summary["endpoints"][endpoint] = {
+            "requests": len(latencies),
+            "errors": stats["errors"],
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+        }
+    summary["requests"] = total
+    summary["throughput_rps"] = round(total / run["elapsed"], 1) if run["elapsed"] else None
+    return summary
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API against local Supabase/Anthropic stand-ins")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests to send (default 200)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight (default 8)")
+    parser.add_argument("--teacher-ratio", type=float, default=0.2,
+                        help="Share of /api/teacher-sessions requests (default 0.2)")
+    parser.add_argument("--students", type=int, default=1000, help="Students per day in the generated workload (default 1000)")
+    parser.add_argument("--days", type=int, default=1, help="Days covered by the workload (1-7, default 1)")
+    parser.add_argument("--overlap", type=float, default=0.5, help="How strongly student windows cluster (0-1, default 0.5)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (default 1)")
+    parser.add_argument("--async-jobs", action="store_true", help="Send chat messages in async job mode")
+    parser.add_argument("--job-workers", type=int, help="JOB_WORKERS for the started server")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Mean fake Anthropic latency (default 300)")
+    parser.add_argument("--llm-overload-rate", type=float, default=0.0, help="Share of fake Anthropic calls answered with 529")
+    parser.add_argument("--db-latency-ms", type=float, default=2, help="Fake Supabase latency per query (default 2)")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds (default 60)")
+    parser.add_argument("--seed", type=int, default=1, help="Workload seed (default 1)")
+    parser.add_argument("--target", help="Drive an already running server at this URL instead of starting one")
+    parser.add_argument("--output", help="Write the summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.requests < 1 or args.concurrency < 1 or args.workers < 1 or args.students < 1:
+        parser.error("--requests, --concurrency, --workers and --students must be positive")
+    if not 0 <= args.teacher_ratio <= 1 or not 0 <= args.llm_overload_rate <= 1:
+        parser.error("--teacher-ratio and --llm-overload-rate must be between 0 and 1")
+    try:
+        setup, workload = build_workload(args.requests, args.teacher_ratio, args.students,
+                                         args.days, args.overlap, args.seed, args.async_jobs)
+    except ValueError as e:
+        parser.error(str(e))
+
+    fakes = process = None
+    base_url = args.target
+    try:
+        if not base_url:
+            config = FakeConfig(args.db_latency_ms / 1000, args.llm_latency_ms / 1000, args.llm_overload_rate)
+            fakes = start_fakes(config)
+            fake_url = f"http://127.0.0.1:{fakes.server_address[1]}"
+            port = _free_port()
+            print(f"🧪 Fakes at {fake_url}, starting api_server with {args.workers} worker(s) on :{port}")
+            extra_env = {"JOB_WORKERS": str(args.job_workers)} if args.job_workers else None
+            process = start_api_server(fake_url, port, args.workers, extra_env)
+            base_url = f"http://127.0.0.1:{port}"
+
+        # The teacher's availability makes student requests schedulable
+        for payload in setup:
+            httpx.post(f"{base_url}/api/chat-session", json=payload, timeout=args.timeout)
+
+        summary = summarize(asyncio.run(drive(base_url, workload, args.concurrency, args.timeout)))
+        summary["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if fakes is not None:
+            fakes.shutdown()
+
+    print(f"📊 {summary['requests']} requests in {summary['elapsed_s']} s = {summary['throughput_rps']} req/s")
+    print(f"{'endpoint':<24} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in summary["endpoints"].items():
+        print(f"{endpoint:<24} {stats['requests']:>8} {stats['errors']:>7} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
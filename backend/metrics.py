@@ -0,0 +1,239 @@
+"""
+In-process metrics for the scheduler, rendered in Prometheus text format
+at /api/metrics.
+
+Metrics are plain objects guarded by one lock each; observing a value is a
+bisect and two additions, so instrumenting the hot path costs microseconds.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from tracing import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY = []
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> dict:
+        """Current values keyed by label-value tuple"""
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block, including when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_latest() -> str:
+    """All registered metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# === Scheduler metrics ===
+
+REQUEST_LATENCY = Histogram("scheduler_request_seconds", "End-to-end API request latency", ("endpoint",))
+STAGE_LATENCY = Histogram("scheduler_stage_seconds", "Latency of each pipeline stage", ("stage",))
+EXTERNAL_LATENCY = Histogram("scheduler_external_call_seconds", "Latency of Supabase and Anthropic calls", ("service", "operation"))
+CACHE_HITS = Counter("scheduler_cache_hits_total", "Cache hits", ("cache",))
+CACHE_MISSES = Counter("scheduler_cache_misses_total", "Cache misses", ("cache",))
+LLM_FALLBACKS = Counter("scheduler_llm_fallbacks_total", "LLM results replaced by the algorithmic fallback", ("stage",))
+LLM_OVERLOADED = Counter("scheduler_llm_overloaded_total", "Anthropic 529 / overloaded responses", ("stage",))
+STARTUP_SECONDS = Gauge("scheduler_startup_seconds", "Time spent importing modules and building clients", ("component",))
+EVENTS_PUBLISHED = Counter("scheduler_events_published_total", "Session change events published to push subscribers", ("type",))
+EVENT_SUBSCRIBERS = Gauge("scheduler_event_subscribers", "Open /api/events streams")
+JOBS_PENDING = Gauge("scheduler_jobs_pending", "Chat jobs queued or running")
+JOBS_FINISHED = Counter("scheduler_jobs_finished_total", "Chat jobs finished", ("status",))
+LLM_IN_FLIGHT = Gauge("scheduler_llm_in_flight", "Anthropic calls in progress")
+SHED_TIER = Gauge("scheduler_shed_tier", "Load shedding tier (0 = full service)")
+SHED_TRANSITIONS = Counter("scheduler_shed_transitions_total", "Load shedding tier changes", ("from_tier", "to_tier"))
+SHED_SKIPS = Counter("scheduler_shed_skips_total", "LLM calls skipped by load shedding", ("stage",))
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into STAGE_LATENCY and the active trace"""
+    with span(name), STAGE_LATENCY.time(stage=name):
+        yield
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    """Time a Supabase/Anthropic call into EXTERNAL_LATENCY and the active trace"""
+    with span(f"{service}.{operation}", service=service), EXTERNAL_LATENCY.time(service=service, operation=operation):
+        yield
+
+
+@contextmanager
+def startup_phase(component: str):
+    """Record how long importing or building a component took in STARTUP_SECONDS"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_SECONDS.set(round(time.perf_counter() - started, 4), component=component)
+
+
+def startup_report() -> dict:
+    """{component: seconds} for everything initialized so far"""
+    return {key[0]: value for key, value in sorted(STARTUP_SECONDS.snapshot().items())}
+
+
+class _TimedQuery:
+    """Wraps a Supabase query builder so execute() is timed per table"""
+    __slots__ = ("_query", "_table")
+
+    def __init__(self, query, table: str):
+        self._query = query
+        self._table = table
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if name == "execute":
+            def execute(*args, **kwargs):
+                with external_call("supabase", self._table):
+                    return attr(*args, **kwargs)
+            return execute
+        if callable(attr):
+            def chain(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                return _TimedQuery(result, self._table) if hasattr(result, "execute") else result
+            return chain
+        return attr
+
+
+class TimedSupabase:
+    """Supabase client proxy recording every query's latency under its table name"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _TimedQuery(self._client.table(name), name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
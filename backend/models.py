@@ -0,0 +1,129 @@
+"""
+Typed in-memory records for sessions, enrollments and availability.
+
+Supabase rows are dicts with "HH:MM:SS" time strings and ISO dates.
+from_row() converts them once, where they are read, into slotted records
+holding times as minutes since midnight and dates as ordinals, so conflict
+checks and timing optimization compare plain ints. to_row() converts back
+for writes, events and API responses; the start_time/end_time/date
+properties give the storage strings for messages.
+"""
+from dataclasses import dataclass
+from datetime import date as _date
+from typing import Optional
+
+from scheduling import time_to_minutes, minutes_to_time
+
+
+def date_to_ordinal(value: str) -> int:
+    return _date.fromisoformat(value).toordinal()
+
+
+def ordinal_to_date(ordinal: int) -> str:
+    return _date.fromordinal(ordinal).isoformat()
+
+
+def clock(minutes: int) -> str:
+    """'HH:MM' for messages"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class _Window:
+    """Shared accessors for records with day/start/end"""
+    __slots__ = ()
+
+    @property
+    def date(self) -> str:
+        return ordinal_to_date(self.day)
+
+    @property
+    def start_time(self) -> str:
+        return minutes_to_time(self.start)
+
+    @property
+    def end_time(self) -> str:
+        return minutes_to_time(self.end)
+
+    @property
+    def window(self) -> tuple:
+        return self.start, self.end
+
+    @property
+    def label(self) -> str:
+        """'HH:MM-HH:MM'"""
+        return f"{clock(self.start)}-{clock(self.end)}"
+
+
+@dataclass(slots=True)
+class Session(_Window):
+    id: str
+    subject: str
+    day: int
+    start: int
+    end: int
+    total_students: int = 0
+    status: str = "active"
+    teacher_id: Optional[str] = None
+    meet_link: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Session":
+        return cls(row["id"], row["subject"], date_to_ordinal(row["date"]),
+                   time_to_minutes(row["start_time"]), time_to_minutes(row["end_time"]),
+                   row.get("total_students") or 0, row.get("status") or "active",
+                   row.get("teacher_id"), row.get("meet_link"))
+
+    def to_row(self) -> dict:
+        return {"id": self.id, "teacher_id": self.teacher_id, "subject": self.subject, "date": self.date,
+                "start_time": self.start_time, "end_time": self.end_time, "meet_link": self.meet_link,
+                "status": self.status, "total_students": self.total_students}
+
+
+@dataclass(slots=True)
+class StudentAvailability(_Window):
+    student_id: str
+    subject: str
+    day: int
+    start: int
+    end: int
+    session_id: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: dict) -> "StudentAvailability":
+        return cls(row["student_id"], row["subject"], date_to_ordinal(row["date"]),
+                   time_to_minutes(row["start_time"]), time_to_minutes(row["end_time"]), row.get("session_id"))
+
+    def to_row(self) -> dict:
+        return {"student_id": self.student_id, "date": self.date, "start_time": self.start_time,
+                "end_time": self.end_time, "subject": self.subject, "session_id": self.session_id}
+
+
+@dataclass(slots=True)
+class TeacherWindow(_Window):
+    teacher_id: str
+    day: int
+    start: int
+    end: int
+    subject: str = "any"
+
+    @classmethod
+    def from_row(cls, row: dict) -> "TeacherWindow":
+        return cls(row["teacher_id"], date_to_ordinal(row["date"]),
+                   time_to_minutes(row["start_time"]), time_to_minutes(row["end_time"]), row.get("subject") or "any")
+
+    def to_row(self) -> dict:
+        return {"teacher_id": self.teacher_id, "date": self.date, "start_time": self.start_time,
+                "end_time": self.end_time, "subject": self.subject}
+
+
+@dataclass(slots=True)
+class Enrollment:
+    session_id: str
+    student_id: str
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Enrollment":
+        return cls(row["session_id"], row["student_id"])
+
+    def to_row(self) -> dict:
+        return {"session_id": self.session_id, "student_id": self.student_id}
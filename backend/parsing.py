@@ -0,0 +1,392 @@
+"""
+Message parsing: user ids, times, subjects and input validation.
+
+The manual parsers are pure; the *_with_ai variants ask Claude first and
+fall back to them.
+"""
+import logging
+import re
+
+from clients import get_chat_model, invoke_llm
+from load_shedding import shedder
+from metrics import CACHE_HITS, CACHE_MISSES, LLM_FALLBACKS
+from subjects import PRIORITY_KEYWORDS
+
+logger = logging.getLogger(__name__)
+
+def extract_user_id_from_message(message: str) -> tuple:
+    """Extract user ID from message format"""
+    if message.startswith("Student "):
+        parts = message.split(": ", 1)
+        if len(parts) == 2:
+            user_id = parts[0].replace("Student ", "")
+            return user_id, False, parts[1]
+    elif message.startswith("Teacher "):
+        parts = message.split(": ", 1)
+        if len(parts) == 2:
+            user_id = parts[0].replace("Teacher ", "")
+            return user_id, True, parts[1]
+    
+    return "default-user", False, message
+
+def parse_time_from_message(message: str) -> tuple:
+    """Extract time information from user message"""
+    message_lower = message.lower()
+    
+    # Enhanced time patterns with better range support
+    time_patterns = [
+        # Pattern 1: "9am to 5pm", "10am-3pm", "2-4pm"
+        r'(\d{1,2})\s*(am|pm)\s*(?:to|-)\s*(\d{1,2})\s*(am|pm)',
+        # Pattern 2: "9-5pm" (both times same am/pm)
+        r'(\d{1,2})\s*-\s*(\d{1,2})\s*(am|pm)',
+        # Pattern 3: "2:30-4:30pm"
+        r'(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*(am|pm)',
+        # Pattern 4: Single time "2pm"
+        r'(\d{1,2})\s*(am|pm)',
+    ]
+    
+    for i, pattern in enumerate(time_patterns):
+        match = re.search(pattern, message_lower)
+        if match:
+            groups = match.groups()
+            logger.debug("🕐 Pattern %s matched: %s", i + 1, groups)
+            
+            if i == 0:  # "9am to 5pm" or "10am-3pm"
+                start_hour = int(groups[0])
+                start_ampm = groups[1]
+                end_hour = int(groups[2])
+                end_ampm = groups[3]
+                
+                # Convert start time
+                if start_ampm == 'pm' and start_hour < 12:
+                    start_hour += 12
+                elif start_ampm == 'am' and start_hour == 12:
+                    start_hour = 0
+                
+                # Convert end time
+                if end_ampm == 'pm' and end_hour < 12:
+                    end_hour += 12
+                elif end_ampm == 'am' and end_hour == 12:
+                    end_hour = 0
+                
+                return f"{start_hour:02d}:00:00", f"{end_hour:02d}:00:00"
+                
+            elif i == 1:  # "9-5pm" (both same am/pm)
+                start_hour = int(groups[0])
+                end_hour = int(groups[1])
+                am_pm = groups[2]
+                
+                # Convert both times
+                if am_pm == 'pm':
+                    if start_hour < 12:
+                        start_hour += 12
+                    if end_hour < 12:
+                        end_hour += 12
+                elif am_pm == 'am':
+                    if start_hour == 12:
+                        start_hour = 0
+                    if end_hour == 12:
+                        end_hour = 0
+                
+                return f"{start_hour:02d}:00:00", f"{end_hour:02d}:00:00"
+                
+            elif i == 2:  # "2:30-4:30pm"
+                start_hour = int(groups[0])
+                start_min = int(groups[1])
+                end_hour = int(groups[2])
+                end_min = int(groups[3])
+                am_pm = groups[4]
+                
+                # Convert times
+                if am_pm == 'pm':
+                    if start_hour < 12:
+                        start_hour += 12
+                    if end_hour < 12:
+                        end_hour += 12
+                elif am_pm == 'am':
+                    if start_hour == 12:
+                        start_hour = 0
+                    if end_hour == 12:
+                        end_hour = 0
+                
+                return f"{start_hour:02d}:{start_min:02d}:00", f"{end_hour:02d}:{end_min:02d}:00"
+                
+            elif i == 3:  # Single time "2pm"
+                start_hour = int(groups[0])
+                am_pm = groups[1]
+                
+                if am_pm == 'pm' and start_hour < 12:
+                    start_hour += 12
+                elif am_pm == 'am' and start_hour == 12:
+                    start_hour = 0
+                
+                end_hour = start_hour + 1
+                return f"{start_hour:02d}:00:00", f"{end_hour:02d}:00:00"
+    
+    logger.debug("🕐 No time pattern matched, using default")
+    # Default fallback
+    return "14:00:00", "15:00:00"
+
+def validate_input(message: str) -> tuple:
+    """Validate user input and return (is_valid, error_message)"""
+    if not message or len(message.strip()) < 3:
+        return False, "Please tell me what you want to learn."
+    
+    # Check for basic session keywords
+    session_keywords = ['session', 'class', 'lesson', 'learn', 'teach', 'available', 'want', 'need']
+    if not any(keyword in message.lower() for keyword in session_keywords):
+        return False, "What subject do you want to learn?"
+    
+    return True, ""
+
+def normalize_subject_with_ai(subject: str) -> str:
+    """Use AI to intelligently map any subject to broad categories.
+    
+    This allows for flexible subject recognition including new technologies
+    like LangChain, Streamlit, AI, Machine Learning, etc.
+    """
+    try:
+        # Shared Claude model (built on first use)
+        claude = get_chat_model(0)
+        if claude is None:
+            raise RuntimeError("Anthropic model unavailable")
+        
+        prompt = f"""
+        Map the following technology/subject to ONE of these broad categories:
+        - python (for Python, Django, Flask, FastAPI, Streamlit, pandas, AI, Machine Learning, OpenAI, etc.)
+        - react (for React, Next.js, JSX, Redux, Gatsby, etc.)
+        - vue (for Vue.js, Nuxt, Vuex, etc.)  
+        - java (for Java, Spring, Hibernate, Spring Boot, etc.)
+        - javascript (for Node.js, Express, vanilla JS, TypeScript, etc.)
+        - database (for SQL, MySQL, MongoDB, PostgreSQL, etc.)
+        - web (for HTML, CSS, Bootstrap, Tailwind, SASS, etc.)
+        - mobile (for Android, iOS, Flutter, React Native, Swift, Kotlin, etc.)
+        - devops (for Docker, Kubernetes, AWS, Azure, GCP, CI/CD, Jenkins, etc.)
+        
+        Subject to map: "{subject}"
+        
+        Return ONLY the broad category name (e.g., "python", "react", etc.). No explanation needed.
+        """
+        
+        response = invoke_llm(claude, prompt, "normalize_subject")
+        mapped_subject = response.content.strip().lower()
+        
+        # Validate the response is one of our allowed subjects
+        allowed_subjects = ["python", "react", "vue", "java", "javascript", "database", "web", "mobile", "devops"]
+        if mapped_subject in allowed_subjects:
+            logger.debug("🤖 AI mapped '%s' → '%s'", subject, mapped_subject)
+            return mapped_subject
+        else:
+            logger.warning("⚠️ AI returned invalid subject '%s', defaulting to 'python'", mapped_subject)
+            return "python"
+            
+    except Exception as e:
+        logger.error("❌ AI subject mapping failed: %s", e)
+        # Fallback to manual mapping
+        return normalize_subject_manual(subject)
+
+def normalize_subject_manual(subject: str) -> str:
+    """Fallback manual subject mapping if AI fails"""
+    subject = subject.lower().strip()
+    
+    # Direct mapping for broad subjects
+    allowed_subjects = ["python", "react", "vue", "java", "javascript", "database", "web", "mobile", "devops"]
+    if subject in allowed_subjects:
+        return subject
+    
+    # Basic fallback mapping for common cases
+    if any(keyword in subject for keyword in ["python", "flask", "django", "fastapi", "langchain", "ai", "ml", "machine learning", "openai"]):
+        return "python"
+    elif any(keyword in subject for keyword in ["react", "nextjs", "next.js", "jsx"]):
+        return "react"
+    elif any(keyword in subject for keyword in ["java", "spring"]):
+        return "java"  
+    elif any(keyword in subject for keyword in ["javascript", "js", "node", "express"]):
+        return "javascript"
+    elif any(keyword in subject for keyword in ["aws", "docker", "kubernetes", "devops"]):
+        return "devops"
+    else:
+        return "python"  # Default fallback
+
+def extract_subject_and_timing_with_ai(message: str) -> tuple:
+    """Use AI to extract subject and timing from user message with retry logic and caching."""
+    import time
+    import hashlib
+    
+    # Simple in-memory cache to reduce API calls
+    if not hasattr(extract_subject_and_timing_with_ai, 'cache'):
+        extract_subject_and_timing_with_ai.cache = {}
+    
+    # Create cache key
+    cache_key = hashlib.md5(message.lower().encode()).hexdigest()
+    if cache_key in extract_subject_and_timing_with_ai.cache:
+        cached_result = extract_subject_and_timing_with_ai.cache[cache_key]
+        CACHE_HITS.inc(cache="extract")
+        logger.debug("🔄 Using cached result for similar message")
+        return cached_result
+    CACHE_MISSES.inc(cache="extract")
+    
+    if shedder.skip("extract"):
+        return extract_subject_and_timing_manual(message)
+    
+    max_retries = 1  # Single retry to fail very fast
+    base_delay = 0.2  # Very short delay
+    
+    for attempt in range(max_retries):
+        try:
+            claude = get_chat_model(0)
+            if claude is None:
+                raise RuntimeError("Anthropic model unavailable")
+            
+            prompt = f"""
+            You are an intelligent session scheduler. Extract the subject and timing from this student message:
+            "{message}"
+            
+            SUBJECT MAPPING - Be flexible and intelligent:
+            - python: Python, Django, Flask, FastAPI, Streamlit, pandas, numpy, AI, ML, machine learning, data science, LangChain, OpenAI, ChatGPT, artificial intelligence, deep learning, neural networks, TensorFlow, PyTorch, scikit-learn
+            - react: React, ReactJS, Next.js, JSX, Redux, Gatsby, React Native (web focus)
+            - vue: Vue, Vue.js, Vuejs, Nuxt, Vuex, Vue 3
+            - java: Java, Spring, Spring Boot, Hibernate, Maven, Gradle, JPA, JSP, Servlets
+            - javascript: JavaScript, JS, Node.js, Express, TypeScript, TS, vanilla JS, ES6, npm, yarn
+            - database: SQL, MySQL, PostgreSQL, MongoDB, database, DB, SQLite, Redis, NoSQL, queries, data modeling
+            - web: HTML, CSS, Bootstrap, Tailwind, SASS, SCSS, web development, frontend, responsive design, CSS Grid, Flexbox
+            - mobile: Android, iOS, Flutter, React Native (mobile focus), Swift, Kotlin, mobile development, app development
+            - devops: Docker, Kubernetes, AWS, Azure, GCP, Jenkins, CI/CD, DevOps, deployment, cloud, infrastructure, containers
+            
+            INTELLIGENT SUBJECT DETECTION:
+            - If message mentions specific technologies, map to appropriate category
+            - If message is vague like "coding", "programming", "development" without specifics, return "UNCLEAR"
+            - If message mentions multiple subjects, pick the most prominent one
+            - Be flexible with variations and typos (e.g., "Reactjs" → react, "Pyhton" → python)
+            
+            TIMING EXTRACTION:
+            - Look for patterns like "2-3pm", "14:00-15:00", "2 to 3", "from 2 to 3"
+            - Default to 14:00-15:00 if no clear time mentioned
+            - Convert 12-hour to 24-hour format
+            
+            Respond in this EXACT format:
+            SUBJECT: [category or UNCLEAR]
+            START_TIME: [HH:MM:SS]  
+            END_TIME: [HH:MM:SS]
+            
+            Examples:
+            "I want React session 2-3pm" → SUBJECT: react, START_TIME: 14:00:00, END_TIME: 15:00:00
+            "Need help with coding" → SUBJECT: UNCLEAR, START_TIME: 14:00:00, END_TIME: 15:00:00
+            "Docker training tomorrow" → SUBJECT: devops, START_TIME: 14:00:00, END_TIME: 15:00:00
+            """
+            
+            response = invoke_llm(claude, prompt, "extract")
+            ai_response = response.content if hasattr(response, 'content') else str(response)
+            
+            # Parse AI response
+            subject = None  # ✅ Changed: No default, let manual extraction handle it
+            start_time = "14:00:00"  # default
+            end_time = "15:00:00"    # default
+            
+            for line in ai_response.split('\n'):
+                if line.startswith('SUBJECT:'):
+                    subject = line.split(':', 1)[1].strip().lower()
+                elif line.startswith('START_TIME:'):
+                    start_time = line.split(':', 1)[1].strip()
+                    if len(start_time) == 5:  # HH:MM format
+                        start_time += ":00"
+                elif line.startswith('END_TIME:'):
+                    end_time = line.split(':', 1)[1].strip()
+                    if len(end_time) == 5:  # HH:MM format
+                        end_time += ":00"
+            
+            # Handle AI response
+            valid_subjects = ["python", "react", "vue", "java", "javascript", "database", "web", "mobile", "devops", "genai", "ai", "ml"]
+            
+            result = None
+            if subject == "unclear":
+                logger.debug("🤖 AI determined subject is UNCLEAR from message: '%s'", message)
+                result = (None, start_time, end_time)  # Return None to trigger error message
+            elif subject and subject in valid_subjects:
+                logger.debug("🤖 AI extracted - Subject: %s, Time: %s-%s", subject, start_time, end_time)
+                result = (subject, start_time, end_time)
+            else:
+                logger.warning("⚠️ AI returned unexpected subject: %s, trying manual extraction", subject)
+                LLM_FALLBACKS.inc(stage="extract")
+                result = extract_subject_and_timing_manual(message)
+            
+            # Cache successful AI results
+            if result and result[0] is not None:
+                extract_subject_and_timing_with_ai.cache[cache_key] = result
+            
+            return result
+                
+        except Exception as e:
+            error_msg = str(e)
+            LLM_FALLBACKS.inc(stage="extract")
+            
+            # Check for rate limiting (529 error) - fail fast
+            if "529" in error_msg or "overloaded" in error_msg.lower():
+                logger.warning("❌ AI rate limited, immediately using manual extraction")
+                break  # Skip retries for rate limiting
+            else:
+                logger.warning("❌ AI extraction failed: %s, using manual method", e)
+                break  # Skip retries for other errors too
+            
+            # Fallback to manual extraction
+            return extract_subject_and_timing_manual(message)
+    
+    # If all retries failed, use manual extraction
+    return extract_subject_and_timing_manual(message)
+
+def extract_subject_and_timing_manual(message: str) -> tuple:
+    """Enhanced manual fallback with fuzzy matching and intelligent detection"""
+    message_lower = message.lower().strip()
+    
+    # Check priority keywords in order (most specific first)
+    for keyword, subject in PRIORITY_KEYWORDS:
+        if keyword in message_lower:
+            logger.debug("🔍 Fast manual: found '%s' → '%s'", keyword, subject)
+            start_time, end_time = parse_time_from_message(message)
+            return subject, start_time, end_time
+    
+    # Simple typo handling for most common cases
+    typo_fixes = [
+        ("pyhton", "python"), ("pythn", "python"), ("phyton", "python"),
+        ("reactjs", "react"), ("reakt", "react"), ("reat", "react"),
+        ("javascrip", "javascript"), ("javas", "java"),
+    ]
+    
+    for typo, correct in typo_fixes:
+        if typo in message_lower:
+            logger.debug("🔍 Fast manual: typo fix '%s' → '%s'", typo, correct)
+            start_time, end_time = parse_time_from_message(message)
+            return correct, start_time, end_time
+    
+    # Check for vague patterns that should return None
+    vague_patterns = [
+        "help with coding", "teach me programming", "learn development", 
+        "help with my project", "coding help", "programming help",
+        "can you teach me", "i need help", "help me learn"
+    ]
+    
+    if any(pattern in message_lower for pattern in vague_patterns):
+        logger.debug("⚠️ Enhanced manual: Detected vague request pattern")
+        start_time, end_time = parse_time_from_message(message)
+        return None, start_time, end_time
+    
+    # Context-based intelligent guessing
+    context_hints = {
+        "frontend": "react", "backend": "python", "fullstack": "python",
+        "website": "web", "web development": "web", "ui": "react",
+        "server": "python", "api": "python", "microservice": "java",
+        "data analysis": "python", "analytics": "python", "visualization": "python",
+        "mobile app": "mobile", "app development": "mobile", "android app": "mobile",
+        "cloud deployment": "devops", "infrastructure": "devops", "containerization": "devops"
+    }
+    
+    for hint, subject in context_hints.items():
+        if hint in message_lower:
+            logger.debug("🔍 Enhanced manual: context hint '%s' → '%s'", hint, subject)
+            start_time, end_time = parse_time_from_message(message)
+            return subject, start_time, end_time
+    
+    # ✅ SAFE: Return None if no clear subject found
+    logger.debug("⚠️ Enhanced manual: No clear subject found in '%s'", message)
+    start_time, end_time = parse_time_from_message(message)
+    return None, start_time, end_time
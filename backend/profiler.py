@@ -0,0 +1,112 @@
+"""
+On-demand statistical profiler for live requests.
+
+A background thread samples the stack of the thread serving a request every
+few milliseconds and aggregates the samples into collapsed stacks
+("frame;frame;frame count" lines), the input format of flamegraph.pl,
+speedscope and inferno.
+
+Environment:
+    PROFILE_SAMPLE_RATE  fraction of API requests profiled automatically (default 0)
+    PROFILE_TOKEN        enables per-request profiling with an "X-Profile: <token>" header,
+                         and guards the /api/debug/profiles endpoints
+    PROFILE_INTERVAL_MS  sampling interval (default 5)
+    PROFILE_DIR          directory the .folded files are written to (default "profiles")
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_KEPT_PROFILES = 20
+
+# Most recent profiles by id, for the debug endpoint
+recent_profiles = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def should_profile(header_value: str = None) -> bool:
+    """Profile this request? Either the header carries the token or the request is sampled"""
+    if PROFILE_TOKEN and header_value == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a daemon thread until stopped"""
+
+    def __init__(self, thread_id: int = None, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format, heaviest stacks first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def save_profile(profiler: SamplingProfiler, name: str, trace_id: str = None) -> str:
+    """Keep a finished profile for the debug endpoint and write it to PROFILE_DIR; returns its id"""
+    profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{trace_id or os.urandom(4).hex()}"
+    folded = profiler.collapsed()
+    with _recent_lock:
+        recent_profiles[profile_id] = {
+            "id": profile_id,
+            "name": name,
+            "duration_ms": round(profiler.duration * 1000, 1),
+            "samples": sum(profiler.samples.values()),
+            "folded": folded,
+        }
+        while len(recent_profiles) > MAX_KEPT_PROFILES:
+            recent_profiles.popitem(last=False)
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+            f.write(folded)
+    except OSError as e:
+        logger.warning("⚠️ Could not write profile %s: %s", profile_id, e)
+    logger.info("🔬 Profiled %s: %s samples in %.0f ms (%s)", name,
+                recent_profiles[profile_id]["samples"], profiler.duration * 1000, profile_id)
+    return profile_id
@@ -0,0 +1,155 @@
+"""
+Opt-in capture of API traffic for replay (see replay.py).
+
+Each recorded request becomes one JSON line, gzip-compressed: the endpoint,
+the request payload and response with ids pseudonymized and emails/phone
+numbers scrubbed, the request duration and the time spent in each pipeline
+stage and external call (from the active trace). Anonymizing and writing
+happen on a background thread.
+
+Environment:
+    RECORD_REQUESTS     file to append captures to, e.g. captures/api-{pid}.jsonl.gz
+                        ("{pid}" keeps several workers from sharing one file)
+    RECORD_SAMPLE_RATE  fraction of requests recorded (default 1)
+    RECORD_SALT         secret for pseudonymizing ids; set it to keep them linkable
+                        across restarts (default: random per process)
+"""
+import atexit
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+
+from tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+RECORD_REQUESTS = os.getenv("RECORD_REQUESTS", "")
+RECORD_SAMPLE_RATE = float(os.getenv("RECORD_SAMPLE_RATE", "1"))
+RECORD_SALT = os.getenv("RECORD_SALT") or secrets.token_hex(16)
+
+_ID_KEYS = {"id", "user_id", "teacher_id", "student_id", "session_id"}
+_UUID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\d[\d ().-]{8,}\d")
+
+
+class Anonymizer:
+    """Stable pseudonyms for ids within one salt; keep_ids pass through unchanged"""
+
+    def __init__(self, salt: str, keep_ids: tuple = ()):
+        self.salt = salt.encode()
+        self.keep_ids = set(keep_ids)
+
+    def pseudonym(self, value) -> str:
+        value = str(value)
+        if value in self.keep_ids:
+            return value
+        return "anon-" + hmac.new(self.salt, value.encode(), hashlib.sha256).hexdigest()[:16]
+
+    def scrub(self, text: str) -> str:
+        text = _EMAIL.sub("<email>", text)
+        text = _PHONE.sub("<phone>", text)
+        return _UUID.sub(lambda m: self.pseudonym(m.group(0)), text)
+
+    def __call__(self, value):
+        if isinstance(value, dict):
+            return {k: self.pseudonym(v) if k in _ID_KEYS and v is not None else self(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self(v) for v in value]
+        if isinstance(value, str):
+            return self.scrub(value)
+        return value
+
+
+def trace_timings():
+    """(request ms so far, {span name: total ms}) for the active trace, or (None, {})"""
+    trace = current_trace()
+    if trace is None or not trace.spans:
+        return None, {}
+    stages = {}
+    for s in trace.spans[1:]:
+        if s.end_ns is not None:
+            stages[s.name] = round(stages.get(s.name, 0) + s.duration_ms, 3)
+    return round((time.time_ns() - trace.spans[0].start_ns) / 1e6, 3), stages
+
+
+def record(endpoint: str, payload: dict, response: dict):
+    """Queue one request/response pair; does nothing unless RECORD_REQUESTS is set"""
+    if _writer is None or (RECORD_SAMPLE_RATE < 1 and random.random() >= RECORD_SAMPLE_RATE):
+        return
+    duration_ms, stages = trace_timings()
+    _writer.submit({
+        "ts": round(time.time(), 3),
+        "endpoint": endpoint,
+        "request": payload,
+        "response": response,
+        "duration_ms": duration_ms,
+        "stages": stages,
+    })
+
+
+def load_capture(path: str) -> list:
+    """Records from a capture file (.gz or plain JSONL)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _Writer:
+    """Anonymizes and appends records from a background thread, one gzip member per batch"""
+
+    def __init__(self, path: str):
+        self.path = path.replace("{pid}", str(os.getpid()))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._anonymize = None
+        self._thread = threading.Thread(target=self._run, name="request-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, entry: dict):
+        self._queue.put(entry)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while not self._queue.empty() and len(batch) < 500:
+                batch.append(self._queue.get())
+            done = None in batch
+            entries = [entry for entry in batch if entry is not None]
+            if entries:
+                self._write(entries)
+            if done:
+                return
+
+    def _write(self, entries: list):
+        if self._anonymize is None:
+            # The designated teacher id is kept so teacher requests still replay as the teacher
+            from tools import TEACHER_ID
+            self._anonymize = Anonymizer(RECORD_SALT, keep_ids=(TEACHER_ID,))
+        try:
+            with gzip.open(self.path, "at") as f:
+                for entry in entries:
+                    entry["request"] = self._anonymize(entry["request"])
+                    entry["response"] = self._anonymize(entry["response"])
+                    f.write(json.dumps(entry, default=str, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning("⚠️ Could not write %s recorded requests: %s", len(entries), e)
+
+
+_writer = _Writer(RECORD_REQUESTS) if RECORD_REQUESTS else None
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Replay recorded API traffic against this tree and diff the outcome.
+
+Feeds a capture written with RECORD_REQUESTS (see recorder.py) through
+api_server running on the loadtest.py Supabase/Anthropic stand-ins, in the
+recorded order, with the replayed server recording its own capture. Then it
+compares both captures request by request (responses with ids masked) and
+compares latency distributions per endpoint and per stage. Internal latency
+excludes time spent in Supabase/Anthropic calls, so it stays comparable
+between production traffic and the stubbed replay.
+
+Usage:
+    python replay.py captures/api.jsonl.gz
+    python replay.py captures/api.jsonl.gz --save replayed.jsonl.gz --llm-latency-ms 300
+    python replay.py before.jsonl.gz --against after.jsonl.gz      # diff two captures, no replay
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+import httpx
+
+from loadtest import FakeConfig, start_fakes, start_api_server, percentile, _free_port
+from recorder import load_capture
+
+EXTERNAL_PREFIXES = ("supabase.", "anthropic.")
+_MASK = re.compile(r"anon-[0-9a-f]{16}|\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+
+
+def outcome(record: dict):
+    """What a request did, without ids or timestamps"""
+    response = record["response"]
+    if record["endpoint"] == "/api/teacher-sessions":
+        sessions = sorted(
+            (s.get("subject"), s.get("date"), s.get("start_time"), s.get("end_time"), s.get("total_students"), s.get("status"))
+            for s in response.get("sessions", [])
+        )
+        return response.get("success"), [list(s) for s in sessions]
+    return response.get("success"), _MASK.sub("<id>", str(response.get("response", response.get("error", ""))))
+
+
+def internal_ms(record: dict):
+    if record.get("duration_ms") is None:
+        return None
+    external = sum(ms for name, ms in record.get("stages", {}).items() if name.startswith(EXTERNAL_PREFIXES))
+    return max(record["duration_ms"] - external, 0.0)
+
+
+def _distribution(values: list) -> dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {}
+    return {q: round(percentile(values, int(q[1:])), 2) for q in ("p50", "p95", "p99")}
+
+
+def latency_profile(records: list) -> dict:
+    """{endpoint: {"total": {p50..}, "internal": {...}, "stages": {name: {...}}}}"""
+    grouped = {}
+    for record in records:
+        group = grouped.setdefault(record["endpoint"], {"total": [], "internal": [], "stages": {}})
+        group["total"].append(record.get("duration_ms"))
+        group["internal"].append(internal_ms(record))
+        for name, ms in record.get("stages", {}).items():
+            group["stages"].setdefault(name, []).append(ms)
+    return {
+        endpoint: {
+            "total": _distribution(group["total"]),
+            "internal": _distribution(group["internal"]),
+            "stages": {name: _distribution(values) for name, values in sorted(group["stages"].items())},
+        }
+        for endpoint, group in grouped.items()
+    }
+
+
+def diff_captures(before: list, after: list, latency_threshold: float) -> dict:
+    mismatches = []
+    for i, (old, new) in enumerate(zip(before, after)):
+        if old["endpoint"] != new["endpoint"] or outcome(old) != outcome(new):
+            mismatches.append({"index": i, "endpoint": old["endpoint"], "request": old["request"],
+                               "before": outcome(old), "after": outcome(new)})
+
+    old_profile, new_profile = latency_profile(before), latency_profile(after)
+    regressions = []
+    for endpoint, new_stats in new_profile.items():
+        old_p95 = old_profile.get(endpoint, {}).get("internal", {}).get("p95")
+        new_p95 = new_stats["internal"].get("p95")
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + latency_threshold):
+            regressions.append({"endpoint": endpoint, "internal_p95_before": old_p95, "internal_p95_after": new_p95})
+
+    return {
+        "requests": {"before": len(before), "after": len(after)},
+        "mismatches": mismatches,
+        "latency": {"before": old_profile, "after": new_profile},
+        "regressions": regressions,
+    }
+
+
+def replay(records: list, save_path: str, llm_latency: float, db_latency: float, timeout: float) -> list:
+    """Send the recorded requests in order to a fresh server and return its own capture"""
+    fakes = start_fakes(FakeConfig(db_latency, llm_latency, 0.0))
+    fake_url = f"http://127.0.0.1:{fakes.server_address[1]}"
+    port = _free_port()
+    process = start_api_server(fake_url, port, 1, extra_env={"RECORD_REQUESTS": save_path, "RECORD_SAMPLE_RATE": "1"})
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            for record in records:
+                client.post(record["endpoint"], json=record["request"])
+    finally:
+        # Graceful shutdown flushes the server's recorder
+        process.terminate()
+        process.wait(timeout=30)
+        fakes.shutdown()
+    return load_capture(save_path)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a request capture and diff behavior and latency")
+    parser.add_argument("capture", help="Capture written with RECORD_REQUESTS")
+    parser.add_argument("--against", help="Compare with this capture instead of replaying")
+    parser.add_argument("--save", help="Keep the replayed capture at this path")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Mean fake Anthropic latency (default 0)")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="Fake Supabase latency per query (default 0)")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds (default 60)")
+    parser.add_argument("--latency-threshold", type=float, default=0.2,
+                        help="Allowed growth of internal p95 latency per endpoint (default 0.2 = 20%%)")
+    parser.add_argument("--max-mismatches", type=int, default=0, help="Tolerated behavior differences (default 0)")
+    parser.add_argument("--output", help="Write the full diff report as JSON")
+    args = parser.parse_args(argv)
+
+    before = load_capture(args.capture)
+    if args.against:
+        after = load_capture(args.against)
+    else:
+        save_path = args.save or os.path.join(tempfile.mkdtemp(prefix="replay-"), "replayed.jsonl.gz")
+        print(f"🔁 Replaying {len(before)} requests (capture: {save_path})")
+        after = replay(before, save_path, args.llm_latency_ms / 1000, args.db_latency_ms / 1000, args.timeout)
+
+    report = diff_captures(before, after, args.latency_threshold)
+
+    print(f"📼 {report['requests']['before']} recorded, {report['requests']['after']} replayed, "
+          f"{len(report['mismatches'])} behavior differences")
+    for mismatch in report["mismatches"][:10]:
+        print(f"  #{mismatch['index']} {mismatch['endpoint']}: {mismatch['before']} → {mismatch['after']}")
+    for endpoint, stats in report["latency"]["after"].items():
+        old = report["latency"]["before"].get(endpoint, {})
+        print(f"⏱️ {endpoint}: internal p50/p95 {old.get('internal', {}).get('p50')}/{old.get('internal', {}).get('p95')} ms"
+              f" → {stats['internal'].get('p50')}/{stats['internal'].get('p95')} ms")
+    for regression in report["regressions"]:
+        print(f"❌ {regression['endpoint']} internal p95 {regression['internal_p95_before']} → "
+              f"{regression['internal_p95_after']} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    failed = len(report["mismatches"]) > args.max_mismatches or report["regressions"] \
+        or report["requests"]["before"] != report["requests"]["after"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Whole-day batch schedule solver.
+
+Takes every pending student_availability row for a date (all subjects) plus
+the teacher's windows and picks non-overlapping session windows, at most one
+per subject, that serve as many students as possible.
+
+Usage:
+    python schedule_solver.py 2025-01-20
+    python schedule_solver.py --input rows.json --duration 90
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from scheduling import time_to_minutes, minutes_to_time, DEFAULT_TEACHER_WINDOW
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _parse_row(row: dict):
+    """(student_id, subject, start, end) for a usable availability row, else None"""
+    subject = row.get('subject')
+    student_id = row.get('student_id')
+    if not subject or not student_id:
+        return None
+    try:
+        start = time_to_minutes(row['start_time'])
+        end = time_to_minutes(row['end_time'])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    if not 0 <= start < end <= MINUTES_PER_DAY:
+        return None
+    return student_id, subject.lower(), start, end
+
+
+def build_demand_matrix(subject_idx: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                        n_subjects: int, duration: int) -> np.ndarray:
+    """demand[s, t] = students of subject s whose window contains [t, t + duration).
+
+    A student fits every start minute in [start, end - duration], so each row is
+    one +1/-1 pair in a difference array and a cumulative sum gives the grid.
+    """
+    diff = np.zeros((n_subjects, MINUTES_PER_DAY + 1), dtype=np.int32)
+    last_start = ends - duration
+    fits = last_start >= starts
+    np.add.at(diff, (subject_idx[fits], starts[fits]), 1)
+    np.add.at(diff, (subject_idx[fits], last_start[fits] + 1), -1)
+    return np.cumsum(diff[:, :MINUTES_PER_DAY], axis=1, dtype=np.int32)
+
+
+def allowed_starts(windows: list, duration: int, step: int) -> np.ndarray:
+    """Boolean mask of start minutes on the step grid that fit a teacher window"""
+    allowed = np.zeros(MINUTES_PER_DAY, dtype=bool)
+    for window_start, window_end in windows:
+        last = min(window_end, MINUTES_PER_DAY) - duration
+        if last >= window_start:
+            allowed[max(window_start, 0):last + 1] = True
+    grid = np.zeros(MINUTES_PER_DAY, dtype=bool)
+    grid[::step] = True
+    return allowed & grid
+
+
+def best_timeline(demand: np.ndarray, duration: int) -> list:
+    """Weighted interval scheduling over start minutes.
+
+    Every start t is an interval [t, t + duration) worth the best subject's
+    demand there. Returns the optimal non-overlapping (subject, start) picks.
+    """
+    best_subject = np.argmax(demand, axis=0)
+    best_value = demand[best_subject, np.arange(demand.shape[1])]
+    candidates = np.flatnonzero(best_value > 0)
+    if candidates.size == 0:
+        return []
+
+    values = best_value[candidates]
+    # prev[i] = last candidate ending at or before candidate i starts (-1 if none)
+    prev = np.searchsorted(candidates, candidates - duration, side='right') - 1
+
+    total = np.zeros(candidates.size + 1, dtype=np.int64)  # total[i + 1] = best using candidates[:i + 1]
+    for i in range(candidates.size):
+        total[i + 1] = max(total[i], total[prev[i] + 1] + values[i])
+
+    picks = []
+    i = candidates.size - 1
+    while i >= 0:
+        if total[i + 1] == total[i]:
+            i -= 1
+        else:
+            start = int(candidates[i])
+            picks.append((int(best_subject[start]), start))
+            i = prev[i]
+    picks.reverse()
+    return picks
+
+
+def solve_schedule(availability: list, teacher_windows: list,
+                   duration: int = 60, step: int = 15) -> dict:
+    """Choose session windows for a day.
+
+    availability: rows with student_id, subject, start_time, end_time.
+    teacher_windows: rows with start_time, end_time; none means no sessions.
+
+    The timeline is solved exactly with weighted-interval-scheduling DP. If the
+    optimum uses a subject twice, that subject is pinned to its most popular
+    chosen window and the DP is re-run, until every subject appears at most once.
+    """
+    if duration <= 0 or duration > MINUTES_PER_DAY:
+        raise ValueError("duration must be between 1 and 1440 minutes")
+    if step <= 0:
+        raise ValueError("step must be a positive number of minutes")
+
+    parsed = []
+    seen = set()
+    skipped_rows = 0
+    for row in availability:
+        fields = _parse_row(row)
+        if fields is None:
+            skipped_rows += 1
+            continue
+        # One request per student and subject
+        if (fields[0], fields[1]) in seen:
+            continue
+        seen.add((fields[0], fields[1]))
+        parsed.append(fields)
+
+    all_students = {row.get('student_id') for row in availability if row.get('student_id')}
+    windows = [(time_to_minutes(w['start_time']), time_to_minutes(w['end_time'])) for w in teacher_windows or []]
+
+    subjects = sorted({fields[1] for fields in parsed})
+    subject_pos = {subject: i for i, subject in enumerate(subjects)}
+    student_ids = [fields[0] for fields in parsed]
+    subject_idx = np.array([subject_pos[fields[1]] for fields in parsed], dtype=np.int32)
+    starts = np.array([fields[2] for fields in parsed], dtype=np.int32)
+    ends = np.array([fields[3] for fields in parsed], dtype=np.int32)
+
+    picks = []
+    if subjects and windows:
+        demand = build_demand_matrix(subject_idx, starts, ends, len(subjects), duration)
+        demand[:, ~allowed_starts(windows, duration, step)] = 0
+
+        while True:
+            picks = best_timeline(demand, duration)
+            by_subject = {}
+            for subject, start in picks:
+                by_subject.setdefault(subject, []).append(start)
+            repeated = {s: times for s, times in by_subject.items() if len(times) > 1}
+            if not repeated:
+                break
+            for subject, times in repeated.items():
+                keep = max(times, key=lambda t: demand[subject, t])
+                kept_value = demand[subject, keep]
+                demand[subject, :] = 0
+                demand[subject, keep] = kept_value
+
+    sessions = []
+    served = set()
+    for subject, start in picks:
+        end = start + duration
+        members = np.flatnonzero((subject_idx == subject) & (starts <= start) & (ends >= end))
+        session_students = [student_ids[i] for i in members]
+        served.update(session_students)
+        sessions.append({
+            "subject": subjects[subject],
+            "start_time": minutes_to_time(start),
+            "end_time": minutes_to_time(end),
+            "student_ids": session_students,
+        })
+
+    return {
+        "sessions": sessions,
+        "unserved": sorted(all_students - served),
+        "students_served": len(served),
+        "students_total": len(all_students),
+        "skipped_rows": skipped_rows,
+    }
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Solve a whole day's session schedule")
+    parser.add_argument("date", nargs="?", help="Date to solve (YYYY-MM-DD), loaded from Supabase")
+    parser.add_argument("--input", help="JSON file with 'availability' and optional 'teacher_windows' rows "
+                                        "instead of Supabase (teacher windows default to 09:00-21:00)")
+    parser.add_argument("--duration", type=int, default=60, help="Session length in minutes (default 60)")
+    parser.add_argument("--step", type=int, default=15, help="Start time granularity in minutes (default 15)")
+    args = parser.parse_args(argv)
+
+    if not 0 < args.duration <= MINUTES_PER_DAY:
+        parser.error("--duration must be between 1 and 1440")
+    if args.step <= 0:
+        parser.error("--step must be positive")
+
+    if args.input:
+        with open(args.input) as f:
+            data = json.load(f)
+        availability = data["availability"]
+        default_window = [{"start_time": DEFAULT_TEACHER_WINDOW[0], "end_time": DEFAULT_TEACHER_WINDOW[1]}]
+        teacher_windows = data.get("teacher_windows", default_window)
+    elif args.date:
+        from tools import load_day_demand
+        availability, teacher_windows = load_day_demand(args.date)
+    else:
+        parser.error("either a date or --input is required")
+
+    started = time.perf_counter()
+    plan = solve_schedule(availability, teacher_windows, duration=args.duration, step=args.step)
+    plan["solve_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    json.dump(plan, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Scheduling primitives shared by the session tools: time conversion, a
+per-date interval index for conflict detection, free-slot search and
+splitting a cohort into several sections, and per-session demand tracking.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+
+def time_to_minutes(time_str: str) -> int:
+    """Convert 'HH:MM' or 'HH:MM:SS' to minutes since midnight"""
+    hours, minutes = time_str.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def minutes_to_time(minutes: int) -> str:
+    """Convert minutes since midnight to 'HH:MM:SS'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+class IntervalIndex:
+    """Sorted-array interval index over integer minutes for one date.
+
+    Rows are records with integer-minute start/end and a subject
+    (models.Session, models.TeacherWindow). They are kept sorted by start
+    time next to a running maximum of end times, so an overlap query is two
+    bisects plus a scan of the candidates. On a conflict-free day (no session
+    nested inside another) every candidate is a hit and queries are
+    O(log n + k).
+    """
+
+    def __init__(self, rows: list = None):
+        self.rows = sorted(rows or [], key=lambda row: row.start)
+        self.starts = [row.start for row in self.rows]
+        self.ends = [row.end for row in self.rows]
+        self.max_ends = []
+        for end in self.ends:
+            self.max_ends.append(max(end, self.max_ends[-1]) if self.max_ends else end)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def overlapping(self, start_mins: int, end_mins: int) -> list:
+        """Rows whose [start, end) overlaps [start_mins, end_mins)"""
+        hi = bisect_left(self.starts, end_mins)
+        lo = bisect_right(self.max_ends, start_mins, 0, hi)
+        return [self.rows[i] for i in range(lo, hi) if self.ends[i] > start_mins]
+
+    def containing(self, start_mins: int, end_mins: int) -> list:
+        """Rows whose window fully contains [start_mins, end_mins)"""
+        hi = bisect_right(self.starts, start_mins)
+        lo = bisect_left(self.max_ends, end_mins, 0, hi)
+        return [self.rows[i] for i in range(lo, hi) if self.ends[i] >= end_mins]
+
+    def conflicts(self, start_mins: int, end_mins: int, subject: str = None) -> list:
+        """Rows overlapping [start_mins, end_mins), skipping rows of `subject`"""
+        overlaps = self.overlapping(start_mins, end_mins)
+        if subject is None:
+            return overlaps
+        return [row for row in overlaps if row.subject != subject]
+
+    def for_subject(self, subject: str) -> list:
+        """Rows of one subject, in start-time order"""
+        return [row for row in self.rows if row.subject == subject]
+
+
+# Typical teacher day, used when offline input does not list teacher windows
+DEFAULT_TEACHER_WINDOW = ("09:00:00", "21:00:00")
+
+
+def free_gaps(busy: list, windows: list) -> list:
+    """Subtract busy (start, end) minute ranges from teacher windows.
+
+    Both inputs are lists of (start_mins, end_mins); returns the free ranges
+    in start order.
+    """
+    gaps = []
+    busy = sorted(busy)
+    for window_start, window_end in sorted(windows):
+        cursor = window_start
+        for busy_start, busy_end in busy:
+            if busy_end <= cursor:
+                continue
+            if busy_start >= window_end:
+                break
+            if busy_start > cursor:
+                gaps.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if cursor < window_end:
+            gaps.append((cursor, window_end))
+    return gaps
+
+
+def find_free_slots(busy: list, windows: list, start_mins: int, end_mins: int,
+                    k: int = 3, step: int = 30) -> list:
+    """Top-k conflict-free windows of the requested duration closest to the request.
+
+    Candidates inside each free gap start at the point nearest the requested
+    start and walk outwards in `step` minute increments, so only O(k) starts are
+    generated per gap. Returns (start_mins, end_mins) tuples, closest first.
+    """
+    duration = end_mins - start_mins
+    if duration <= 0 or k <= 0:
+        return []
+
+    candidates = []
+    for gap_start, gap_end in free_gaps(busy, windows):
+        latest = gap_end - duration
+        if latest < gap_start:
+            continue
+        nearest = min(max(start_mins, gap_start), latest)
+        candidates.append(nearest)
+        for i in range(1, k):
+            if nearest - i * step >= gap_start:
+                candidates.append(nearest - i * step)
+            if nearest + i * step <= latest:
+                candidates.append(nearest + i * step)
+
+    best = sorted(set(candidates), key=lambda s: (abs(s - start_mins), s))[:k]
+    return [(s, s + duration) for s in best]
+
+
+def _section_starts(windows: list, duration: int, step: int) -> list:
+    """Start minutes on the step grid where a session fits inside a teacher window"""
+    starts = set()
+    for window_start, window_end in windows:
+        first = -(-window_start // step) * step
+        starts.update(range(first, window_end - duration + 1, step))
+    return sorted(starts)
+
+
+def _best_sections(intervals: list, candidates: list, duration: int,
+                   max_class_size: int, max_sections: int) -> list:
+    """Non-overlapping section starts maximising capped demand, at most max_sections.
+
+    DP over candidate starts: best[j][i] is the most students servable with j
+    sections among candidates[:i], where a section at t is worth
+    min(max_class_size, students who fit t).
+    """
+    if not candidates or max_sections <= 0:
+        return []
+    pos = {t: i for i, t in enumerate(candidates)}
+    diff = [0] * (len(candidates) + 1)
+    for start, end in intervals:
+        lo = bisect_left(candidates, start)
+        hi = bisect_right(candidates, end - duration)
+        if lo < hi:
+            diff[lo] += 1
+            diff[hi] -= 1
+    value = []
+    running = 0
+    for i in range(len(candidates)):
+        running += diff[i]
+        value.append(min(running, max_class_size))
+
+    prev = [bisect_right(candidates, t - duration) for t in candidates]  # candidates[:prev[i]] end before t
+    m = len(candidates)
+    best = [[0] * (m + 1) for _ in range(max_sections + 1)]
+    for j in range(1, max_sections + 1):
+        row, below = best[j], best[j - 1]
+        for i in range(m):
+            take = below[prev[i]] + value[i] if value[i] > 0 else 0
+            row[i + 1] = max(row[i], take)
+
+    picks = []
+    j, i = max_sections, m
+    while j > 0 and i > 0:
+        if best[j][i] == best[j][i - 1]:
+            i -= 1
+        else:
+            picks.append(candidates[i - 1])
+            i = prev[i - 1]
+            j -= 1
+    picks.reverse()
+    return picks
+
+
+def _assign_students(intervals: list, starts: list, duration: int, max_class_size: int) -> dict:
+    """Assign students to section starts, earliest-deadline first.
+
+    Sweeping sections in time order and filling each with the students whose
+    last feasible start is soonest is the optimal capacitated assignment for a
+    fixed set of sections.
+    """
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+    members = {t: [] for t in starts}
+    waiting = []
+    cursor = 0
+    for t in sorted(starts):
+        while cursor < len(order) and intervals[order[cursor]][0] <= t:
+            i = order[cursor]
+            heapq.heappush(waiting, (intervals[i][1] - duration, i))
+            cursor += 1
+        while waiting and len(members[t]) < max_class_size:
+            deadline, i = heapq.heappop(waiting)
+            if deadline >= t:
+                members[t].append(i)
+    return members
+
+
+def split_into_sections(intervals: list, windows: list, duration: int = 60,
+                        max_class_size: int = 20, max_sections: int = 3, step: int = 15) -> dict:
+    """Cluster student (start, end) minute ranges into up to max_sections sessions.
+
+    Sections never overlap (there is one teacher) and must fit a teacher window.
+    Section starts come from the DP in _best_sections; students are then placed
+    by an earliest-deadline sweep. Because the DP can count the same student
+    towards two neighbouring sections, leftover students get another pass with
+    any unused section budget.
+
+    Returns {"sections": [{"start", "end", "members"}], "unassigned": [...]},
+    where members/unassigned are indices into `intervals`.
+    """
+    candidates = _section_starts(windows, duration, step)
+    remaining = list(range(len(intervals)))
+    sections = []
+    while remaining and len(sections) < max_sections:
+        taken = [(s['start'], s['start'] + duration) for s in sections]
+        free = [t for t in candidates if all(t + duration <= a or t >= b for a, b in taken)]
+        pending = [intervals[i] for i in remaining]
+        starts = _best_sections(pending, free, duration, max_class_size, max_sections - len(sections))
+        members = _assign_students(pending, starts, duration, max_class_size)
+        placed = [(t, [remaining[i] for i in idx]) for t, idx in members.items() if idx]
+        if not placed:
+            break
+        for t, idx in placed:
+            sections.append({"start": t, "end": t + duration, "members": idx})
+        assigned = {i for _, idx in placed for i in idx}
+        remaining = [i for i in remaining if i not in assigned]
+
+    sections.sort(key=lambda s: s['start'])
+    return {"sections": sections, "unassigned": remaining}
+
+
+class SessionDemand:
+    """Multiset of the student windows (in minutes) behind one session.
+
+    Re-optimising the timing from it costs O(distinct windows) instead of
+    O(students).
+    """
+
+    def __init__(self, windows: list = ()):
+        self.counts = Counter()
+        self.total = 0
+        for start, end in windows:
+            self.add(start, end)
+
+    def __len__(self):
+        return self.total
+
+    def add(self, start_mins: int, end_mins: int):
+        self.counts[(start_mins, end_mins)] += 1
+        self.total += 1
+
+    def remove(self, start_mins: int, end_mins: int):
+        key = (start_mins, end_mins)
+        if self.counts[key] <= 0:
+            del self.counts[key]
+            return
+        self.counts[key] -= 1
+        self.total -= 1
+        if not self.counts[key]:
+            del self.counts[key]
+
+    def optimal_window(self, min_overlap: int = 30):
+        """Same rule as calculate_optimal_timing: the common overlap if it is at
+        least min_overlap minutes, otherwise the most requested exact window."""
+        if not self.counts:
+            return None
+        latest_start = max(start for start, _ in self.counts)
+        earliest_end = min(end for _, end in self.counts)
+        if earliest_end - latest_start >= min_overlap:
+            return latest_start, earliest_end
+        return max(self.counts.items(), key=lambda item: item[1])[0]
@@ -1,40 +1,141 @@
 #!/usr/bin/env python3
 """
-Simple startup script for the AI Session Scheduler backend
+Startup script for the AI Session Scheduler backend
+
+    python start.py         production: several worker processes on uvloop/httptools,
+                            graceful shutdown, workers replaced after MAX_REQUESTS requests
+    python start.py --dev   one process that reloads on code changes
+
+Each worker is a separate process with its own clients, caches, event bus
+and metrics; idempotency keys and async job records are shared through
+IDEMPOTENCY_DIR and JOB_DIR.
+
+Environment:
+    HOST              bind address (default 0.0.0.0)
+    PORT              port to listen on (default 8000; Render sets it)
+    WEB_CONCURRENCY   worker processes (default: available CPUs, at most 4)
+    GRACEFUL_TIMEOUT  seconds open requests get to finish on shutdown (default 20)
+    MAX_REQUESTS      requests a worker serves before it is replaced (default 10000, 0 never)
+    MAX_REQUESTS_JITTER  up to this many extra requests per worker (default MAX_REQUESTS / 10)
 """
-import uvicorn
+import argparse
+import atexit
+import importlib.util
 import os
+import random
+import sys
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
 try:
-    import dotenv
-    dotenv.load()
+    from dotenv import load_dotenv
+    load_dotenv()
 except ImportError:
     # Fallback if python-dotenv is not available
     pass
 
-if __name__ == "__main__":
+MAX_DEFAULT_WORKERS = 4
+
+
+def default_workers() -> int:
+    """WEB_CONCURRENCY, else the CPUs this process may run on (capped)"""
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return min(cpus, MAX_DEFAULT_WORKERS)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+class RecyclingServer(uvicorn.Server):
+    """Worker server whose request limit gets a random extra of up to `jitter`, so workers
+    started together are not all replaced at once (the supervisor replaces them one at a time)"""
+
+    def __init__(self, config: uvicorn.Config, jitter: int):
+        super().__init__(config)
+        self.jitter = jitter
+
+    def run(self, sockets=None):
+        # Runs in each worker process, including the ones started to replace recycled workers
+        if self.config.limit_max_requests:
+            self.config.limit_max_requests += random.randint(0, self.jitter)
+        super().run(sockets)
+        # Tearing down the interpreter takes seconds with the agent's libraries loaded, and the
+        # supervisor doesn't start the replacement until this process is gone
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the AI Session Scheduler backend")
+    parser.add_argument("--dev", action="store_true", help="Single process with auto-reload")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: WEB_CONCURRENCY or CPUs, at most 4)")
+    args = parser.parse_args(argv)
+    # The keep-alive task reads PORT in the server processes
+    os.environ["PORT"] = str(args.port)
+
     print("🚀 Starting AI Session Scheduler Backend...")
-    print("📡 Backend URL: http://localhost:8000")
-    print("📖 API Documentation: http://localhost:8000/docs")
+    print(f"📡 Backend URL: http://localhost:{args.port}")
+    print(f"📖 API Documentation: http://localhost:{args.port}/docs")
     print("🔧 Environment loaded from .env file")
-    
+
     # Check if required environment variables are set
     required_vars = ["SUPABASE_URL", "SUPABASE_KEY", "ANTHROPIC_API_KEY"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
-    
+
     if missing_vars:
         print(f"⚠️  Warning: Missing environment variables: {', '.join(missing_vars)}")
         print("   The system will use fallback values, but some features may not work properly.")
     else:
         print("✅ All required environment variables are set")
-    
+
+    if args.dev:
+        print("🔁 Development mode: one process, reloading on code changes")
+        uvicorn.run("api_server:app", host=args.host, port=args.port, reload=True, log_level="info")
+        return
+
+    workers = args.workers or default_workers()
+    # A single process has no supervisor to replace it, so it is never recycled
+    max_requests = int(os.getenv("MAX_REQUESTS", "10000")) if workers > 1 else 0
+    jitter = int(os.getenv("MAX_REQUESTS_JITTER", str(max_requests // 10)))
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    print(f"⚙️  Production mode: {workers} worker(s), {loop}/{http}, "
+          f"recycled after {max_requests or 'unlimited'} requests")
+
     print("\n" + "="*50)
     print("Backend is starting...")
     print("="*50 + "\n")
-    
-    uvicorn.run(
+
+    config = uvicorn.Config(
         "api_server:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "20")),
+        limit_max_requests=max_requests or None,
         log_level="info"
-    )
\ No newline at end of file
+    )
+    if workers > 1:
+        # Inherited by the worker processes
+        os.environ.setdefault("WARMUP_BEFORE_SERVING", "1")
+        # What uvicorn.run does for workers > 1, with RecyclingServer as the worker target
+        server = RecyclingServer(config, jitter)
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        uvicorn.Server(config).run()
+
+
+if __name__ == "__main__":
+    main()
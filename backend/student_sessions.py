@@ -0,0 +1,119 @@
+"""
+Per-student index of upcoming sessions, served by /api/my-sessions.
+
+A student's entry is loaded from Supabase on first request, then kept
+current from the session events the write paths in tools.py publish
+(events.py): enrollments, re-timings, leaves and cancellations update the
+entries of the students they concern. Entries are reloaded after
+MY_SESSIONS_TTL seconds as well, which picks up writes handled by other
+worker processes.
+
+Versions are opaque integers hashed from the sessions returned, so every
+worker (and a restarted one) gives the same version for the same list: a
+client that sends back the version it has gets an empty "unchanged" answer
+unless that student's upcoming sessions changed.
+
+Environment:
+    MY_SESSIONS_TTL  seconds before an entry is re-read from Supabase (default 30)
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import events
+from clients import supabase
+from metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+MY_SESSIONS_TTL = float(os.getenv("MY_SESSIONS_TTL", "30"))
+MAX_ENTRIES = 50000
+
+SESSION_FIELDS = ("id", "subject", "date", "start_time", "end_time", "meet_link", "status", "total_students")
+
+def _is_upcoming(session: dict, today: str) -> bool:
+    return session.get("status") == "active" and (session.get("date") or "") >= today
+
+
+def _compact(session: dict) -> dict:
+    return {field: session.get(field) for field in SESSION_FIELDS}
+
+
+def _version(sessions: list) -> int:
+    """Content hash of a session list, small enough to stay exact as a JSON number in browsers"""
+    digest = hashlib.sha1(json.dumps(sessions, sort_keys=True, default=str).encode()).hexdigest()
+    return int(digest[:13], 16)
+
+
+class _Entry:
+    __slots__ = ("sessions", "loaded_at")
+
+    def __init__(self, sessions: dict):
+        self.sessions = sessions  # session_id -> compact row
+        self.loaded_at = time.monotonic()
+
+
+class StudentSessionIndex:
+    def __init__(self, ttl: float = MY_SESSIONS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _load(self, student_id: str) -> dict:
+        today = datetime.now().strftime("%Y-%m-%d")
+        enrollments = supabase.table("session_enrollments").select("session_id").eq("student_id", student_id).execute()
+        session_ids = [row["session_id"] for row in enrollments.data]
+        if not session_ids:
+            return {}
+        rows = supabase.table("sessions").select("*").in_("id", session_ids).gte("date", today).eq("status", "active").execute()
+        return {row["id"]: _compact(row) for row in rows.data}
+
+    def get(self, student_id: str) -> tuple:
+        """(version, upcoming sessions sorted by date and start time)"""
+        with self._lock:
+            entry = self._entries.get(student_id)
+        if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+            CACHE_HITS.inc(cache="my_sessions")
+        else:
+            CACHE_MISSES.inc(cache="my_sessions")
+            sessions = self._load(student_id)
+            with self._lock:
+                current = self._entries.get(student_id)
+                if current is not None:
+                    current.sessions = sessions
+                    current.loaded_at = time.monotonic()
+                    entry = current
+                else:
+                    if len(self._entries) >= MAX_ENTRIES:
+                        # Drop the oldest-loaded student; they reload on their next request
+                        del self._entries[next(iter(self._entries))]
+                    entry = self._entries[student_id] = _Entry(sessions)
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            sessions = list(entry.sessions.values())
+        upcoming = sorted((s for s in sessions if _is_upcoming(s, today)),
+                          key=lambda s: (s["date"], s["start_time"]))
+        return _version(upcoming), upcoming
+
+    def apply(self, event: dict, audience):
+        """Event listener: update the entries of the students an event concerns"""
+        if audience is None or not event["type"].startswith("session."):
+            return
+        data = event["data"]
+        with self._lock:
+            for user_id in audience:
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                if event["type"] == "session.removed":
+                    entry.sessions.pop(data["session_id"], None)
+                elif user_id != data["session"].get("teacher_id"):
+                    entry.sessions[data["session"]["id"]] = _compact(data["session"])
+
+
+index = StudentSessionIndex()
+events.bus.add_listener(index.apply)
@@ -0,0 +1,102 @@
+"""
+Subject taxonomy shared by the manual extractor and the workload generator.
+"""
+
+# Broad subjects and the technologies/typos that map to them
+SUBJECT_MAPPINGS = {
+    "python": {
+        "exact": ["python", "py"],
+        "frameworks": ["django", "flask", "fastapi", "streamlit", "tornado"],
+        "libraries": ["pandas", "numpy", "matplotlib", "scipy", "requests"],
+        "ai_ml": ["tensorflow", "pytorch", "scikit-learn", "keras", "langchain", "openai", "chatgpt", "ai", "ml", "machine learning", "deep learning", "neural networks", "data science", "nlp"],
+        "typos": ["pyhton", "pythn", "phyton"]  # Common typos
+    },
+    "react": {
+        "exact": ["react", "reactjs", "react.js"],
+        "frameworks": ["nextjs", "next.js", "gatsby", "remix"],
+        "libraries": ["redux", "mobx", "recoil", "zustand"],
+        "concepts": ["jsx", "hooks", "components"]
+    },
+    "vue": {
+        "exact": ["vue", "vuejs", "vue.js"],
+        "frameworks": ["nuxt", "nuxtjs", "quasar"],
+        "libraries": ["vuex", "pinia", "vue-router"],
+        "concepts": ["composition api", "options api"]
+    },
+    "java": {
+        "exact": ["java"],
+        "frameworks": ["spring", "spring boot", "hibernate", "struts"],
+        "tools": ["maven", "gradle"],
+        "concepts": ["jvm", "jpa", "jsp", "servlets"]
+    },
+    "javascript": {
+        "exact": ["javascript", "js"],
+        "runtime": ["nodejs", "node.js", "deno"],
+        "frameworks": ["express", "koa", "nestjs"],
+        "concepts": ["typescript", "es6", "npm", "yarn"]
+    },
+    "database": {
+        "sql": ["mysql", "postgresql", "sqlite", "oracle"],
+        "nosql": ["mongodb", "redis", "cassandra"],
+        "concepts": ["sql", "database", "db", "queries", "data modeling"]
+    },
+    "web": {
+        "markup": ["html", "html5"],
+        "styling": ["css", "css3", "sass", "scss"],
+        "frameworks": ["bootstrap", "tailwind", "bulma"],
+        "concepts": ["responsive design", "flexbox", "grid", "frontend"]
+    },
+    "mobile": {
+        "native": ["android", "ios", "swift", "kotlin"],
+        "cross_platform": ["flutter", "react native", "xamarin"],
+        "concepts": ["mobile development", "app development", "mobile app"]
+    },
+    "devops": {
+        "containers": ["docker", "kubernetes", "podman"],
+        "cloud": ["aws", "azure", "gcp", "google cloud"],
+        "ci_cd": ["jenkins", "github actions", "gitlab ci"],
+        "concepts": ["devops", "deployment", "infrastructure", "cloud", "containers"]
+    }
+}
+
+# keyword -> broad subject, flattened from SUBJECT_MAPPINGS
+KEYWORD_TO_SUBJECT = {
+    keyword.lower(): subject
+    for subject, categories in SUBJECT_MAPPINGS.items()
+    for keywords in categories.values()
+    for keyword in keywords
+}
+
+# Ordered keywords - longer/more specific terms first to avoid conflicts
+PRIORITY_KEYWORDS = [
+    # Multi-word phrases first (most specific)
+    ("machine learning", "python"), ("spring boot", "java"), ("next.js", "react"),
+    ("deep learning", "python"), ("data science", "python"), ("react native", "mobile"),
+    ("mobile app", "mobile"), ("app development", "mobile"),
+
+    # Technology-specific terms
+    ("javascript", "javascript"), ("typescript", "javascript"), ("nodejs", "javascript"), ("node.js", "javascript"),
+    ("python", "python"), ("django", "python"), ("flask", "python"), ("fastapi", "python"),
+    ("react", "react"), ("reactjs", "react"), ("nextjs", "react"), ("jsx", "react"),
+    ("vue", "vue"), ("vuejs", "vue"), ("vue.js", "vue"), ("nuxt", "vue"),
+    ("java", "java"), ("spring", "java"), ("hibernate", "java"),
+
+    # AI/ML terms
+    ("tensorflow", "python"), ("pytorch", "python"), ("langchain", "python"), ("openai", "python"),
+    ("chatgpt", "python"), ("ai", "python"), ("ml", "python"),
+
+    # Web technologies
+    ("html", "web"), ("css", "web"), ("bootstrap", "web"), ("tailwind", "web"),
+
+    # DevOps
+    ("docker", "devops"), ("kubernetes", "devops"), ("aws", "devops"), ("azure", "devops"),
+
+    # Database
+    ("mongodb", "database"), ("mysql", "database"), ("postgresql", "database"), ("sqlite", "database"),
+
+    # Mobile
+    ("android", "mobile"), ("ios", "mobile"), ("flutter", "mobile"), ("swift", "mobile"), ("kotlin", "mobile"),
+
+    # Short forms (last to avoid conflicts)
+    ("js", "javascript"), ("py", "python"),
+]
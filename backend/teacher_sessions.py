@@ -0,0 +1,93 @@
+"""
+Per-teacher session views for /api/teacher-sessions, with versions, ETags
+and deltas.
+
+Every request re-reads the teacher's sessions (one indexed query), so a
+write handled by any worker process is visible at once and a 304 is never
+served for data that has changed. What is saved is the response: versions
+and ETags are hashes of the rows, so every worker (and a restarted one)
+gives the same version and ETag for the same data.
+
+A version names a snapshot of the teacher's sessions (session id -> row
+hash). Each process remembers the last few snapshots per teacher, so a
+dashboard that sends the version it has (since) gets only the sessions
+changed after it. A version this process hasn't seen, or one from before
+a session disappeared from the table, can't be compared, and the full list
+is returned instead.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from clients import supabase
+
+logger = logging.getLogger(__name__)
+
+FILTER_TYPES = ("all", "today_future", "today", "future")
+MAX_TEACHERS = 10000
+SNAPSHOTS_PER_TEACHER = 16
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+def matches_filter(session: dict, filter_type: str, today: str) -> bool:
+    if filter_type == "today_future":
+        return session["date"] >= today
+    if filter_type == "today":
+        return session["date"] == today
+    if filter_type == "future":
+        return session["date"] > today
+    return True
+
+
+class TeacherSessionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()  # teacher_id -> OrderedDict(version -> {session_id: row hash})
+
+    def _load(self, teacher_id: str) -> dict:
+        rows = supabase.table('sessions').select('*').eq('teacher_id', teacher_id).order('date').execute()
+        return {row["id"]: row for row in rows.data}
+
+    def _remember(self, teacher_id: str, version: str, hashes: dict):
+        with self._lock:
+            snapshots = self._snapshots.get(teacher_id)
+            if snapshots is None:
+                if len(self._snapshots) >= MAX_TEACHERS:
+                    self._snapshots.popitem(last=False)
+                snapshots = self._snapshots[teacher_id] = OrderedDict()
+            self._snapshots.move_to_end(teacher_id)
+            snapshots[version] = hashes
+            snapshots.move_to_end(version)
+            while len(snapshots) > SNAPSHOTS_PER_TEACHER:
+                snapshots.popitem(last=False)
+
+    def _snapshot(self, teacher_id: str, version: str):
+        with self._lock:
+            return self._snapshots.get(teacher_id, {}).get(version)
+
+    def get(self, teacher_id: str, filter_type: str = "all", since: str = None) -> dict:
+        """{"version", "etag", "delta", "sessions"}: sessions changed after since when it
+        can be served as a delta, else every session matching filter_type (ordered by date)"""
+        sessions = self._load(teacher_id)
+        hashes = {session_id: _digest(row) for session_id, row in sessions.items()}
+        version = _digest(sorted(hashes.items()))
+        self._remember(teacher_id, version, hashes)
+
+        previous = self._snapshot(teacher_id, since) if since else None
+        delta = previous is not None and not set(previous) - set(hashes)
+        today = datetime.now().strftime("%Y-%m-%d")
+        rows = [row for session_id, row in sessions.items()
+                if matches_filter(row, filter_type, today)
+                and (not delta or previous.get(session_id) != hashes[session_id])]
+        rows.sort(key=lambda row: (row["date"], row.get("start_time") or ""))
+        etag = None if delta else f'W/"{_digest(rows)}"'
+        return {"version": version, "etag": etag, "delta": delta, "sessions": rows}
+
+
+index = TeacherSessionIndex()
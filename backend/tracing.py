@@ -0,0 +1,219 @@
+"""
+Lightweight request tracing.
+
+Each API request opens a trace; `span()` blocks anywhere below it (pipeline
+stages, Supabase queries, Anthropic calls) become child spans via a context
+variable, so nothing has to be passed through function signatures. Outside a
+trace `span()` is a no-op.
+
+Environment:
+    TRACE_EXPORT   "file:<path>" appends one JSON trace per line,
+                   "otlp:<url>" posts OTLP/HTTP JSON (e.g. http://localhost:4318/v1/traces)
+    TRACE_SLOW_MS  log the full span tree of requests slower than this (default 10000, 0 disables)
+"""
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "ai-session-scheduler"
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "10000"))
+
+_current_span = ContextVar("current_span", default=None)
+_TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: str = None):
+        # Incoming ids are only reused when they are valid W3C/OTLP trace ids
+        if not trace_id or not _TRACE_ID.match(trace_id.lower()):
+            trace_id = secrets.token_hex(16)
+        self.trace_id = trace_id.lower()
+        self.spans = []
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: str = None, attributes: dict = None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        trace.spans.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current_trace_id():
+    """Trace id of the active request, or None outside a trace"""
+    current = _current_span.get()
+    return current.trace.trace_id if current is not None else None
+
+
+def current_trace():
+    """Trace of the active request (spans finished so far included), or None outside a trace"""
+    current = _current_span.get()
+    return current.trace if current is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the active span; does nothing outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = repr(e)
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, trace_id: str = None, **attributes):
+    """Root span of a request; exports the trace and logs it if slow when done"""
+    trace = Trace(trace_id)
+    root = Span(trace, name, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = repr(e)
+        raise
+    finally:
+        root.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if TRACE_SLOW_MS and root.duration_ms > TRACE_SLOW_MS:
+            logger.warning("🐢 Slow request %s (%.0f ms), trace %s:\n%s",
+                           name, root.duration_ms, trace.trace_id, render_tree(trace))
+        if _exporter is not None:
+            _exporter.submit(trace)
+
+
+def parse_traceparent(header: str):
+    """Trace id from a W3C traceparent header ('00-<trace-id>-<span-id>-<flags>')"""
+    parts = (header or "").split("-")
+    if len(parts) == 4 and _TRACE_ID.match(parts[1]):
+        return parts[1]
+    return None
+
+
+def render_tree(trace: Trace) -> str:
+    """Indented span tree with durations, for logs"""
+    children = {}
+    for s in trace.spans:
+        children.setdefault(s.parent_id, []).append(s)
+    lines = []
+
+    def walk(parent_id, depth):
+        for s in sorted(children.get(parent_id, []), key=lambda s: s.start_ns):
+            error = f"  ERROR {s.error}" if s.error else ""
+            lines.append(f"{'  ' * depth}{s.name}  {s.duration_ms:.1f} ms{error}")
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def _otlp_payload(trace: Trace) -> dict:
+    def attr(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    spans = []
+    for s in trace.spans:
+        entry = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s.parent_id is None else 1,  # SERVER for the request, INTERNAL below it
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [attr(k, v) for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            entry["parentSpanId"] = s.parent_id
+        spans.append(entry)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [attr("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "scheduler"}, "spans": spans}],
+        }]
+    }
+
+
+class _Exporter:
+    """Ships finished traces from a background thread so requests never wait on I/O"""
+
+    def __init__(self, target: str):
+        self.kind, _, self.destination = target.partition(":")
+        if self.kind not in ("file", "otlp") or not self.destination:
+            raise ValueError(f"Unsupported TRACE_EXPORT target: {target}")
+        self._queue = queue.SimpleQueue()
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def submit(self, trace: Trace):
+        self._queue.put(trace)
+
+    def _run(self):
+        client = None
+        while True:
+            trace = self._queue.get()
+            try:
+                if self.kind == "file":
+                    with open(self.destination, "a") as f:
+                        f.write(json.dumps({"trace_id": trace.trace_id,
+                                            "spans": [s.to_dict() for s in trace.spans]}, default=str) + "\n")
+                else:
+                    if client is None:
+                        import httpx
+                        client = httpx.Client(timeout=5)
+                    client.post(self.destination, json=_otlp_payload(trace))
+            except Exception as e:
+                logger.warning("⚠️ Trace export failed: %s", e)
+
+
+_exporter = _Exporter(TRACE_EXPORT) if TRACE_EXPORT else None
@@ -0,0 +1,105 @@
+"""
+Startup warmup, so the first real request runs at steady-state latency.
+
+Imports the scheduling modules, builds the Supabase and Anthropic clients
+and opens their pooled HTTPS connections, and runs the parsers and the
+timing solver once.
+Each step is timed in scheduler_startup_seconds; a failing step is logged
+and reported but doesn't block readiness (the request path falls back as
+it did before warmup existed).
+
+Environment:
+    WARMUP                 set to 0 to skip the warmup (the server is ready immediately)
+    WARMUP_BEFORE_SERVING  1 finishes the warmup before the process accepts connections
+                           (start.py sets it with several workers, so a worker started in
+                           place of a recycled one doesn't take requests cold)
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+
+from metrics import startup_phase
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP", "1") != "0"
+WARMUP_BEFORE_SERVING = os.getenv("WARMUP_BEFORE_SERVING", "0") == "1"
+
+_SAMPLE_MESSAGES = [
+    "Student warmup: I want to learn python tomorrow 3-5pm",
+    "Teacher warmup: I'm available today from 9am to 6pm",
+]
+
+_state_lock = threading.Lock()
+_state = {"ready": False, "started_at": None, "finished_at": None, "failed": {}}
+
+
+def _import_modules():
+    import tools  # noqa: F401
+    import schedule_solver  # noqa: F401
+
+
+def _open_supabase():
+    from clients import supabase
+    # One query opens the pooled HTTPS connection the request path reuses
+    supabase.table("teacher_availability").select("id").limit(1).execute()
+
+
+def _open_anthropic():
+    from clients import get_chat_model
+    for temperature in (0, 0.1):
+        model = get_chat_model(temperature)
+        if model is None:
+            raise RuntimeError("Anthropic LLM unavailable")
+    # Listing models is free; the connection stays in the shared pool afterwards
+    model._client.models.list(limit=1)
+
+
+def _prime_parsers():
+    from tools import extract_user_id_from_message, extract_subject_and_timing_manual, \
+        parse_time_from_message, validate_input, calculate_optimal_timing
+    for message in _SAMPLE_MESSAGES:
+        _, _, text = extract_user_id_from_message(message)
+        validate_input(text)
+        parse_time_from_message(text)
+        extract_subject_and_timing_manual(text)
+    students = [("15:00:00", "17:00:00"), ("16:00:00", "18:00:00")]
+    calculate_optimal_timing(students)
+    calculate_optimal_timing(students, [("09:00:00", "21:00:00")], mode="split")
+
+
+STEPS = [
+    ("warmup_imports", _import_modules),
+    ("warmup_supabase", _open_supabase),
+    ("warmup_anthropic", _open_anthropic),
+    ("warmup_parsers", _prime_parsers),
+]
+
+
+def run_warmup():
+    """Run every warmup step (blocking) and mark the process ready"""
+    with _state_lock:
+        _state["started_at"] = datetime.now().isoformat()
+    if WARMUP_ENABLED:
+        for name, step in STEPS:
+            try:
+                with startup_phase(name):
+                    step()
+            except Exception as e:
+                logger.warning("⚠️ Warmup step %s failed: %s", name, e)
+                with _state_lock:
+                    _state["failed"][name] = str(e)
+    with _state_lock:
+        _state["ready"] = True
+        _state["finished_at"] = datetime.now().isoformat()
+    logger.info("✅ Warmup finished%s", f" ({len(_state['failed'])} step(s) failed)" if _state["failed"] else "")
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def status() -> dict:
+    with _state_lock:
+        return {**_state, "failed": dict(_state["failed"])}
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic workload generator for benchmarks and load tests.
+
+Builds a population of students requesting sessions over one or more days,
+with subjects drawn from the taxonomy in subjects.py, time windows whose
+overlap is tunable (0 = spread out, 1 = everyone picks one of a few popular
+windows) and the teacher's availability for each day. The same population is
+emitted as chat requests (the formats /api/chat-session and
+run_session_agent take) and as storage fixtures for the Supabase tables.
+
+Dates are tomorrow onwards and spoken as "tomorrow" or a weekday name, so
+messages resolve to the same dates as the fixtures for up to 7 days.
+
+Usage:
+    python workload.py --students 10000 --seed 7 --format messages --output day.jsonl
+    python workload.py --students 20000 --days 3 --overlap 0.8 --format fixtures --output tables.json
+    python workload.py --students 10000 --format solver --output solve.json   # schedule_solver.py --input
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import date, timedelta
+
+from scheduling import time_to_minutes, minutes_to_time, DEFAULT_TEACHER_WINDOW
+from subjects import SUBJECT_MAPPINGS, PRIORITY_KEYWORDS
+
+# Same id as tools.TEACHER_ID; only this user may set availability
+TEACHER_ID = 'e4bcab2f-8da5-4a78-85e8-094f4d7ac308'
+
+MAX_DAYS = 7
+PEAKS_PER_SUBJECT = 3
+
+STUDENT_TEMPLATES = [
+    "I want to learn {topic} {window} {day}",
+    "Can I get a {topic} session {day} {window}?",
+    "need a {topic} class {day}, {window}",
+    "{topic} lesson please {day} {window}",
+]
+TEACHER_TEMPLATE = "I'm available {day} from {window}"
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# Substrings the date parser reads as a weekday ("mongodb" would mean Monday)
+DAY_MARKERS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun", "tomorrow", "today")
+
+
+def _first_match(text: str):
+    text = text.lower()
+    return next((subject for keyword, subject in PRIORITY_KEYWORDS if keyword in text), None)
+
+
+def request_topics() -> dict:
+    """subject -> taxonomy keywords that the manual extractor maps back to that subject
+    in every student template (e.g. "html" is dropped because "ml" matches python first)
+    and that don't contain a weekday marker"""
+    topics = {}
+    for subject, categories in SUBJECT_MAPPINGS.items():
+        for keywords in categories.values():
+            for keyword in keywords:
+                if any(marker in keyword for marker in DAY_MARKERS):
+                    continue
+                rendered = [t.format(topic=keyword, window="", day="tomorrow") for t in STUDENT_TEMPLATES]
+                if all(_first_match(text) == subject for text in rendered):
+                    topics.setdefault(subject, []).append(keyword)
+    return topics
+
+
+def _clock(minutes: int) -> tuple:
+    hour, minute = divmod(minutes, 60)
+    return hour % 12 or 12, minute, "pm" if hour >= 12 else "am"
+
+
+def spoken_window(start: int, end: int, rng: random.Random):
+    """Window as parse_time_from_message understands it, or None if it can't express it"""
+    (sh, sm, sap), (eh, em, eap) = _clock(start), _clock(end)
+    if sm == 0 and em == 0:
+        if end - start == 60 and rng.random() < 0.25:
+            return f"at {sh}{sap}"
+        if sap == eap and (sap == "pm" or start >= 60) and rng.random() < 0.5:
+            return f"{sh}-{eh}{eap}"
+        return f"{sh}{sap} to {eh}{eap}"
+    # Minutes are only understood as "h:mm-h:mm am/pm", i.e. both on the same side of noon
+    if sap == eap and start >= 60:
+        return f"{sh}:{sm:02d}-{eh}:{em:02d}{eap}"
+    return None
+
+
+def _spoken_day(day: date, today: date) -> str:
+    return "tomorrow" if day == today + timedelta(days=1) else WEEKDAYS[day.weekday()]
+
+
+def generate_workload(students: int = 1000, days: int = 1, overlap: float = 0.5, seed: int = 0,
+                      subject_skew: float = 1.0, teacher_window: tuple = DEFAULT_TEACHER_WINDOW,
+                      today: date = None) -> dict:
+    """Every student requests one session per day.
+
+    Returns {"messages": [ChatRequest payloads plus the agent's "text" form, teachers first],
+             "teacher_availability": [rows], "student_availability": [rows]}.
+    """
+    if not 1 <= days <= MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_DAYS}")
+    if not 0 <= overlap <= 1:
+        raise ValueError("overlap must be between 0 and 1")
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    window_start, window_end = time_to_minutes(teacher_window[0]), time_to_minutes(teacher_window[1])
+    if window_end - window_start < 60:
+        raise ValueError("teacher window must be at least an hour")
+
+    topics = request_topics()
+    subjects = sorted(topics)
+    rng.shuffle(subjects)
+    # Zipf-like popularity: a few subjects get most of the demand
+    weights = [1 / (rank + 1) ** subject_skew for rank in range(len(subjects))]
+
+    def random_window():
+        length = rng.choice((60, 60, 90, 120, 180))
+        length = min(length, window_end - window_start)
+        start = window_start + 30 * rng.randrange((window_end - window_start - length) // 30 + 1)
+        return start, start + length
+
+    messages, teacher_rows, student_rows, student_messages = [], [], [], []
+    for offset in range(1, days + 1):
+        day = today + timedelta(days=offset)
+        day_text = _spoken_day(day, today)
+        teacher_rows.append({
+            "teacher_id": TEACHER_ID,
+            "date": day.isoformat(),
+            "start_time": minutes_to_time(window_start),
+            "end_time": minutes_to_time(window_end),
+            "subject": "any",
+        })
+        teacher_text = TEACHER_TEMPLATE.format(day=day_text, window=spoken_window(window_start, window_end, rng)
+                                               or f"{_clock(window_start)[0]}am to {_clock(window_end)[0]}pm")
+        messages.append({"user_id": TEACHER_ID, "is_teacher": True, "message": teacher_text,
+                         "text": f"Teacher {TEACHER_ID}: {teacher_text}"})
+
+        peaks = {subject: [random_window() for _ in range(PEAKS_PER_SUBJECT)] for subject in subjects}
+        for i in range(students):
+            student_id = f"student-{i:06d}"
+            subject = rng.choices(subjects, weights)[0]
+            start, end = rng.choice(peaks[subject]) if rng.random() < overlap else random_window()
+            window = spoken_window(start, end, rng)
+            if window is None:
+                start, end = start - start % 60, end - end % 60 or end
+                window = spoken_window(start, end, rng)
+            text = rng.choice(STUDENT_TEMPLATES).format(topic=rng.choice(topics[subject]), window=window, day=day_text)
+            student_rows.append({
+                "student_id": student_id,
+                "date": day.isoformat(),
+                "start_time": minutes_to_time(start),
+                "end_time": minutes_to_time(end),
+                "subject": subject,
+                "session_id": None,
+            })
+            student_messages.append({"user_id": student_id, "is_teacher": False, "message": text,
+                                     "text": f"Student {student_id}: {text}"})
+
+    rng.shuffle(student_messages)
+    return {
+        "messages": messages + student_messages,
+        "teacher_availability": teacher_rows,
+        "student_availability": student_rows,
+    }
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic scheduling workload")
+    parser.add_argument("--students", type=int, default=1000, help="Students requesting a session each day (default 1000)")
+    parser.add_argument("--days", type=int, default=1, help=f"Days, starting tomorrow (1-{MAX_DAYS}, default 1)")
+    parser.add_argument("--overlap", type=float, default=0.5,
+                        help="Share of students picking one of each subject's popular windows (0-1, default 0.5)")
+    parser.add_argument("--subject-skew", type=float, default=1.0, help="Zipf exponent of subject popularity (default 1.0)")
+    parser.add_argument("--teacher-window", default=f"{DEFAULT_TEACHER_WINDOW[0][:5]}-{DEFAULT_TEACHER_WINDOW[1][:5]}",
+                        help="Teacher availability each day as HH:MM-HH:MM (default 09:00-21:00)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default 0)")
+    parser.add_argument("--format", choices=["messages", "fixtures", "solver"], default="messages",
+                        help="messages: JSONL chat requests; fixtures: rows per Supabase table; "
+                             "solver: first day as schedule_solver.py --input")
+    parser.add_argument("--output", help="Output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    if args.students < 1:
+        parser.error("--students must be positive")
+    try:
+        start, end = (f"{part.strip()}:00" for part in args.teacher_window.split("-"))
+        workload = generate_workload(args.students, args.days, args.overlap, args.seed,
+                                     args.subject_skew, (start, end))
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.format == "messages":
+            for message in workload["messages"]:
+                out.write(json.dumps(message) + "\n")
+        elif args.format == "fixtures":
+            json.dump({table: workload[table] for table in ("teacher_availability", "student_availability")}, out)
+            out.write("\n")
+        else:
+            first_day = workload["teacher_availability"][0]["date"]
+            json.dump({
+                "availability": [row for row in workload["student_availability"] if row["date"] == first_day],
+                "teacher_windows": workload["teacher_availability"][:1],
+            }, out)
+            out.write("\n")
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
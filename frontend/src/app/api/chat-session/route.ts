@@ -6,6 +6,8 @@ export async function POST(request: NextRequest) {
   try {
     const body = await request.json()
     const { message, user_id, is_teacher } = body
+    // Retries carry the same key, so the backend replays instead of re-running the request
+    const idempotencyKey = request.headers.get('idempotency-key') || body.idempotency_key
 
     // Call your Python backend with the chat message
     const backendUrl = process.env.BACKEND_URL || 'http://localhost:8000'
@@ -13,6 +15,7 @@ export async function POST(request: NextRequest) {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}),
       },
       body: JSON.stringify({
         message,
@@ -181,7 +181,9 @@ export default function ChatInterface({ user, isTeacher }: ChatInterfaceProps) {
         headers: { 
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${session?.access_token}`,
-          'apikey': process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY || ''
+          'apikey': process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY || '',
+          // One key per message: a retried request is answered from the first attempt
+          'Idempotency-Key': userMessage.id
         },
         body: JSON.stringify({
           message: inputMessage,